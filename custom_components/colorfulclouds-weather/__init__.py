@@ -13,21 +13,33 @@ For more details about this component, please refer to
 https://github.com/shiqixixixi/colorfulclouds-weather
 """
 import asyncio
-import requests
-import json
+import base64
 import datetime
+import hashlib
+import json
 import logging
+import math
+import time
+import zlib
+from urllib.parse import urlencode
 
-from aiohttp.client_exceptions import ClientConnectorError
+from aiohttp.client_exceptions import ClientError
 from async_timeout import timeout
 
 from homeassistant.const import CONF_API_KEY
-from homeassistant.core import Config, HomeAssistant
+from homeassistant.core import Config, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.util.unit_system import METRIC_SYSTEM
+import homeassistant.util.dt as dt_util
 
+from .api import async_get_client, async_release_client
+from .forecast import ForecastCache
+from .model import parse_payload
+from .polling import adaptive_interval, fetch_slots, phase_offset, seconds_to_slot
 from .const import (
     ATTR_FORECAST,
     CONF_DAILYSTEPS,
@@ -39,27 +51,35 @@ from .const import (
     CONF_LATITUDE,
     CONF_STARTTIME,
     COORDINATOR,
+    DEFAULT_GRID_TOLERANCE,
+    REQUEST_OPTIONS,
     VERSION,
     ROOT_PATH,
     DOMAIN,
     UNDO_UPDATE_LISTENER,
     CONF_UPDATE_INTERVAL,
+    CONF_REFRESH_WINDOW,
+    CONF_REFRESH_MIN_AGE,
+    CONF_SPLIT_ENDPOINTS,
+    CONF_ADAPTIVE_INTERVAL,
+    CONF_MIN_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_DAILY_QUOTA,
+    CONF_GRID_TOLERANCE,
+    CONF_STALE_AFTER,
+    COORDINATORS,
+    DEFAULT_STALE_AFTER,
+    SECTION_INTERVALS,
+    STALE_MARGIN,
+    STORAGE_VERSION,
+    STORAGE_SAVE_DELAY,
+    STARTUP_SPREAD,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = ["sensor", "weather"]
 
-USER_AGENT = 'ColorfulCloudsPro/6.7.2 (iPhone; iOS 16.2; Scale/3.00)'
-DEVICE_ID= 'D9AB80E9-B5CE-40FD-96CD-8E38CF5287B7'
-headers = {'User-Agent': USER_AGENT,
-          'device-id': DEVICE_ID,
-          'Accept': 'application/json',
-          'Accept-Language': 'zh-Hans-CN;q=1',
-		  'app-version': '6.7.2',
-		  'app_name': 'weather',
-		  'app-name': 'weather'}
-          
 async def async_setup(hass: HomeAssistant, config: Config) -> bool:
     """Set up configured colorfulclouds-weather."""
     hass.data.setdefault(DOMAIN, {})
@@ -78,30 +98,8 @@ async def async_setup_entry(hass, config_entry) -> bool:
     _LOGGER.info("setup platform weather.colorfulclouds-weather...")
     
     """Set up colorfulclouds-weather as config entry."""
-    api_key = config_entry.data[CONF_API_KEY]
-    location_key = config_entry.unique_id
-    longitude = config_entry.data[CONF_LONGITUDE]
-    latitude = config_entry.data[CONF_LATITUDE]
-    #api_version = config_entry.data[CONF_API_VERSION]
-    api_version = "v2.6"
-    dailysteps = config_entry.options.get(CONF_DAILYSTEPS, 5)
-    hourlysteps = config_entry.options.get(CONF_HOURLYSTEPS, 24)
-    alert = config_entry.options.get(CONF_ALERT, True)
-    life = config_entry.options.get(CONF_LIFEINDEX, False)
-    starttime = config_entry.options.get(CONF_STARTTIME, 0)
-    update_interval_minutes = config_entry.options.get(CONF_UPDATE_INTERVAL, 10)                                                
-
-    _LOGGER.debug("Using location_key: %s, get forecast: %s", location_key, api_version)
-
-    websession = async_get_clientsession(hass)
-
-    coordinator = colorfulclouds_weatherDataUpdateCoordinator(
-        hass, websession, api_key, api_version, location_key, longitude, latitude, dailysteps, hourlysteps, alert, life, starttime, update_interval_minutes
-    )
-    await coordinator.async_refresh()
-
-    if not coordinator.last_update_success:
-        raise ConfigEntryNotReady
+    coordinator = await _async_get_coordinator(hass, config_entry)
+    coordinator.entries.add(config_entry.entry_id)
 
     undo_listener = config_entry.add_update_listener(update_listener)
 
@@ -131,11 +129,143 @@ async def async_unload_entry(hass, config_entry):
     hass.data[DOMAIN][config_entry.entry_id][UNDO_UPDATE_LISTENER]()
 
     if unload_ok:
-        hass.data[DOMAIN].pop(config_entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(config_entry.entry_id)[COORDINATOR]
+        coordinator.entries.discard(config_entry.entry_id)
+        if not coordinator.entries:
+            hass.data[DOMAIN][COORDINATORS].pop(coordinator.share_key, None)
+            coordinator.async_cancel_expiry()
+            async_release_client(hass, coordinator.api_key, coordinator.share_key)
 
     return unload_ok
 
 
+async def async_remove_entry(hass, config_entry):
+    """Remove the cached payload of a deleted config entry unless another entry shares its coordinator."""
+    key = coordinator_key(config_entry)
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        if entry.entry_id != config_entry.entry_id and coordinator_key(entry) == key:
+            return
+    await Store(hass, STORAGE_VERSION, snapshot_key(key)).async_remove()
+
+
+def grid_cell(config_entry):
+    """Snap an entry's location to the forecast grid, return (cell key, longitude, latitude).
+
+    Caiyun answers with the same grid data for every point of a cell, so entries
+    within grid_tolerance meters of each other can share one coordinator. Off
+    by default, so a lone entry keeps querying its exact coordinates.
+    """
+    longitude = config_entry.data[CONF_LONGITUDE]
+    latitude = config_entry.data[CONF_LATITUDE]
+    tolerance = config_entry.options.get(CONF_GRID_TOLERANCE, DEFAULT_GRID_TOLERANCE)
+    if tolerance:
+        lat_step = tolerance / 111320
+        latitude = round(round(latitude / lat_step) * lat_step, 4)
+        lon_step = lat_step / max(math.cos(math.radians(latitude)), 0.01)
+        longitude = round(round(longitude / lon_step) * lon_step, 4)
+    return f"{longitude}-{latitude}".replace(".", "_"), longitude, latitude
+
+
+def request_options(config_entry):
+    """Return the options the coordinator reads, with the defaults filled in."""
+    return {
+        option: config_entry.options.get(option, default)
+        for option, default in REQUEST_OPTIONS.items()
+    }
+
+
+def coordinator_key(config_entry):
+    """Return the key of the coordinator an entry uses.
+
+    Entries only share a coordinator when they would issue identical requests.
+    """
+    location_key = grid_cell(config_entry)[0]
+    options = tuple(sorted(request_options(config_entry).items()))
+    return (config_entry.data[CONF_API_KEY], location_key, options)
+
+
+def snapshot_key(key):
+    """Return the .storage key of the cached payload of the coordinator with share key key."""
+    # the api key never ends up in a file name
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:12]
+    return f"{DOMAIN}.{key[1]}.{digest}"
+
+
+async def _async_get_coordinator(hass, config_entry):
+    """Return the coordinator for the entry's grid cell, creating and refreshing it once."""
+    location_key, longitude, latitude = grid_cell(config_entry)
+    share_key = coordinator_key(config_entry)
+    registry = hass.data[DOMAIN].setdefault(COORDINATORS, {})
+    if share_key in registry:
+        coordinator = await asyncio.shield(registry[share_key])
+        _LOGGER.debug("%s shares coordinator %s", config_entry.unique_id, location_key)
+        return coordinator
+
+    future = registry[share_key] = hass.loop.create_future()
+    try:
+        coordinator = await _async_create_coordinator(
+            hass, config_entry, share_key, location_key, longitude, latitude
+        )
+    except BaseException:
+        registry.pop(share_key)
+        # the entries waiting on this future retry on their own
+        future.set_exception(ConfigEntryNotReady())
+        future.exception()
+        raise
+    future.set_result(coordinator)
+    return coordinator
+
+
+async def _async_create_coordinator(hass, config_entry, share_key, location_key, longitude, latitude):
+    api_key = config_entry.data[CONF_API_KEY]
+    #api_version = config_entry.data[CONF_API_VERSION]
+    api_version = "v2.6"
+    options = request_options(config_entry)
+    dailysteps = options[CONF_DAILYSTEPS]
+    hourlysteps = options[CONF_HOURLYSTEPS]
+    alert = options[CONF_ALERT]
+    life = options[CONF_LIFEINDEX]
+    starttime = options[CONF_STARTTIME]
+    update_interval_minutes = options[CONF_UPDATE_INTERVAL]
+    refresh_window = options[CONF_REFRESH_WINDOW]
+    refresh_min_age = options[CONF_REFRESH_MIN_AGE]
+    stale_after = options[CONF_STALE_AFTER]
+    section_intervals = None
+    if options[CONF_SPLIT_ENDPOINTS]:
+        section_intervals = {
+            section: options[option] for section, (option, _default) in SECTION_INTERVALS.items()
+        }
+    interval_bounds = None
+    if options[CONF_ADAPTIVE_INTERVAL]:
+        interval_bounds = (options[CONF_MIN_INTERVAL], options[CONF_MAX_INTERVAL])
+
+    _LOGGER.debug("Using location_key: %s, get forecast: %s", location_key, api_version)
+
+    client = await async_get_client(
+        hass, api_key, share_key, options[CONF_DAILY_QUOTA]
+    )
+
+    coordinator = colorfulclouds_weatherDataUpdateCoordinator(
+        hass, client, api_key, api_version, location_key, longitude, latitude, dailysteps, hourlysteps, alert, life, starttime, update_interval_minutes,
+        refresh_window=refresh_window, refresh_min_age=refresh_min_age, section_intervals=section_intervals,
+        interval_bounds=interval_bounds, stale_after=stale_after, share_key=share_key,
+    )
+    if await coordinator.async_load_snapshot():
+        # entities come up from the last good payload, revalidate in the background,
+        # spread over the startup window so many entries do not all fetch at once
+        async def _async_revalidate(_now):
+            await coordinator.async_refresh()
+
+        async_call_later(hass, coordinator.phase * STARTUP_SPREAD, _async_revalidate)
+    else:
+        await coordinator.async_refresh()
+
+        if not coordinator.last_update_success:
+            async_release_client(hass, api_key, share_key)
+            raise ConfigEntryNotReady
+    return coordinator
+
+
 async def update_listener(hass, config_entry):
     """Update listener."""
     await hass.config_entries.async_reload(config_entry.entry_id)
@@ -144,8 +274,13 @@ async def update_listener(hass, config_entry):
 class colorfulclouds_weatherDataUpdateCoordinator(DataUpdateCoordinator):
     """Class to manage fetching colorfulclouds-weather data API."""
 
-    def __init__(self, hass, session, api_key, api_version, location_key, longitude, latitude, dailysteps: int, hourlysteps: int, alert: bool, life: bool, starttime: int, update_interval_minutes: int):
+    def __init__(self, hass, client, api_key, api_version, location_key, longitude, latitude, dailysteps: int, hourlysteps: int, alert: bool, life: bool, starttime: int, update_interval_minutes: int, refresh_window: int = 10, refresh_min_age: int = 60, section_intervals: dict | None = None, interval_bounds: tuple | None = None, stale_after: int = DEFAULT_STALE_AFTER, share_key: tuple | None = None):
         """Initialize."""
+        self.client = client
+        # coordinator_key of the entries using this coordinator
+        self.share_key = share_key
+        # config entries using this coordinator
+        self.entries = set()
         self.location_key = location_key
         self.longitude = longitude
         self.latitude = latitude
@@ -157,83 +292,342 @@ class colorfulclouds_weatherDataUpdateCoordinator(DataUpdateCoordinator):
         self.api_key = api_key
         self.starttime = starttime
         self.update_interval_minutes = update_interval_minutes
-        self._lifeindextime = 0
+        self._lifeindex_slot = None
+        self._lifeindex_stale = False
         self._lifeindex = {}
+        self.refresh_min_age = refresh_min_age
+        # entities are available until server_time + stale_window minutes
+        self.stale_after = stale_after
+        self.stale = False
+        self._expiry_unsub = None
+        self._last_fetch = None
+        self._inflight = None
+        # one cached payload per coordinator, entries of one cell may differ in their requests
+        self._store = Store(hass, STORAGE_VERSION, snapshot_key(share_key))
+        self._fetch_slots = fetch_slots(hass)
+        # where in each interval this coordinator polls, stable across restarts
+        self.phase = phase_offset(location_key)
+        # section -> minutes, None polls everything through weather.json
+        self.section_intervals = section_intervals
+        self._section_fetched = {}
+        self._result = {}
+        # (floor, ceiling) minutes when the interval follows the weather
+        self.interval_bounds = interval_bounds
         is_metric = hass.config.units is METRIC_SYSTEM
         if is_metric:
             self.is_metric = "metric:v2"
         else:
             self.is_metric = "imperial"
+        # forecast rows are built once per payload and shared by every reader
+        self._forecast_cache = ForecastCache((self.is_metric, self.hourlysteps, self.dailysteps, self.starttime))
 
-        update_interval = (
-            datetime.timedelta(minutes = self.update_interval_minutes)
-        )
+        if self.section_intervals:
+            update_interval = datetime.timedelta(minutes = min(self.section_intervals.values()))
+        else:
+            update_interval = (
+                datetime.timedelta(minutes = self.update_interval_minutes)
+            )
         _LOGGER.debug("Data will be update every %s", update_interval)
+        self.poll_interval = self._base_interval = int(update_interval.total_seconds() // 60)
+
+        # entity refresh requests arriving within refresh_window collapse into one
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=DOMAIN,
+            update_interval=update_interval,
+            request_refresh_debouncer=Debouncer(
+                hass, _LOGGER, cooldown=refresh_window, immediate=True
+            ),
+        )
+
+    async def async_load_snapshot(self):
+        """Load the last good payload from .storage, return True when one was found."""
+        try:
+            snapshot = await self._store.async_load()
+        except Exception as error:  # a broken cache must never block setup
+            _LOGGER.warning("%s: ignoring unreadable cached payload: %s", self.location_key, error)
+            return False
+        if not snapshot or not ("result" in snapshot or "result_z" in snapshot):
+            return False
+        try:
+            if "result_z" in snapshot:
+                result = json.loads(zlib.decompress(base64.b64decode(snapshot["result_z"])))
+            else:
+                # written by older versions, uncompressed
+                result = snapshot["result"]
+            resdata = {"server_time": snapshot["server_time"], "result": result}
+            self._lifeindex = snapshot.get("lifeindex", {})
+            data = self._build_data(resdata, cached_at=snapshot.get("cached_at"))
+        except Exception as error:  # fall back to a live refresh
+            _LOGGER.warning("%s: ignoring unparsable cached payload: %s", self.location_key, error)
+            self._lifeindex = {}
+            return False
+        if self.section_intervals:
+            self._result = dict(result)
+        _LOGGER.debug("%s: set up from payload cached at %s", self.location_key, snapshot.get("cached_at"))
+        self.async_set_updated_data(data)
+        return True
+
+    def _async_save_snapshot(self, resdata):
+        """Persist the payload to .storage, deflated; only the latest one of a save delay is encoded."""
+        lifeindex = self._lifeindex
+        cached_at = int(time.time())
+
+        def _snapshot():
+            raw = json.dumps(resdata["result"], ensure_ascii=False, separators=(",", ":")).encode()
+            return {
+                "server_time": resdata["server_time"],
+                "result_z": base64.b64encode(zlib.compress(raw)).decode(),
+                "lifeindex": lifeindex,
+                "cached_at": cached_at,
+            }
+
+        self._store.async_delay_save(_snapshot, STORAGE_SAVE_DELAY)
+
+    @callback
+    def async_update_listeners(self):
+        """Rearm the staleness timer from the current payload, then notify the entities."""
+        self._async_arm_expiry()
+        super().async_update_listeners()
+
+    @property
+    def stale_window(self):
+        """Minutes a payload stays fresh, stretched past the poll interval when polls back off."""
+        return max(self.stale_after, 1.5 * self.poll_interval + STALE_MARGIN)
 
-        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=update_interval)
+    def _async_arm_expiry(self):
+        self.async_cancel_expiry()
+        if not self.data:
+            return
+        delay = self.data["server_time"] + self.stale_window * 60 - time.time()
+        self.stale = delay <= 0
+        if not self.stale:
+            self._expiry_unsub = async_call_later(self.hass, delay, self._async_expire)
 
-    # @asyncio.coroutine
-    def get_data(self, url):
-        json_text = requests.get(url, headers = headers if str(self.api_key)[0:6] == "UR8ASa" else "").content
-        resdata = json.loads(json_text)
-        return resdata
+    @callback
+    def _async_expire(self, _now):
+        """Mark the payload stale, every entity re-renders its availability in one pass."""
+        self._expiry_unsub = None
+        self.stale = True
+        _LOGGER.debug("%s: payload from %s is stale", self.location_key, self.data["server_time"])
+        super().async_update_listeners()
+
+    @callback
+    def async_cancel_expiry(self):
+        """Stop the staleness timer of a coordinator no entry uses any more."""
+        if self._expiry_unsub is not None:
+            self._expiry_unsub()
+            self._expiry_unsub = None
+
+    @property
+    def model(self):
+        """The parsed WeatherModel of the current payload."""
+        return self.data["model"]
+
+    @property
+    def forecasts(self):
+        """The Forecasts of the current payload, built on first use."""
+        return self._forecast_cache.get(self.model)
+
+    def _build_data(self, resdata, cached_at=None):
+        # entities read the columnar model, the raw result is not kept around
+        return {
+            "server_time": resdata["server_time"],
+            "model": parse_payload(resdata["server_time"], resdata["result"], self._lifeindex),
+            "lifeindex": self._lifeindex,
+            "lifeindex_stale": self._lifeindex_stale,
+            "location_key": self.location_key,
+            "is_metric": self.is_metric,
+            "cached": cached_at is not None,
+            "cached_at": cached_at,
+        }
+
+    def _start_timestamp(self):
+        return int((datetime.datetime.now()+datetime.timedelta(days=self.starttime)).timestamp())
+
+    def _section_url(self, section):
+        """Return the url of one caiyun endpoint (weather, realtime, minutely, hourly or daily)."""
+        params = {"unit": self.is_metric}
+        if section in ("weather", "realtime"):
+            params["alert"] = str(self.alert).lower()
+        if section in ("weather", "hourly"):
+            params["hourlysteps"] = self.hourlysteps
+        if section in ("weather", "daily"):
+            params["dailysteps"] = self.dailysteps
+        if section in ("weather", "hourly", "daily"):
+            params["timestamp"] = self._start_timestamp()
+        return str.format("https://api.caiyunapp.com/{}/{}/{},{}/{}.json?{}", self.api_version, self.api_key, self.longitude, self.latitude, section, urlencode(params))
+
+    async def _async_fetch_sections(self):
+        """Poll only the endpoints whose own interval elapsed and merge them into one payload."""
+        now = time.monotonic()
+        # a few seconds of slack so a section is not skipped by scheduling jitter
+        due = [
+            section
+            for section, minutes in self.section_intervals.items()
+            if section not in self._result
+            or now - self._section_fetched.get(section, 0) >= minutes * 60 - 5
+        ]
+        _LOGGER.debug("%s: polling sections %s", self.location_key, due)
+        responses = await asyncio.gather(
+            *[self.client.get_json(self._section_url(section), section) for section in due],
+            return_exceptions=True,
+        )
+        server_time = None
+        error = None
+        for section, response in zip(due, responses):
+            if isinstance(response, BaseException):
+                error = response
+                continue
+            if not isinstance(response, dict) or "result" not in response or "server_time" not in response:
+                # caiyun reports bad keys and exhausted quotas as status: failed, without a result
+                detail = response.get("error") or response.get("status") if isinstance(response, dict) else response
+                error = UpdateFailed(f"{section}: {detail}")
+                continue
+            self._result.update(response["result"])
+            self._section_fetched[section] = now
+            server_time = max(server_time or 0, response["server_time"])
+        if error is not None:
+            raise error
+        if server_time is None:
+            server_time = self.data["server_time"]
+        return {"server_time": server_time, "result": dict(self._result)}
+
+    async def async_request_refresh(self):
+        """Request a refresh, served from the current data while it is still fresh."""
+        if (
+            self.last_update_success
+            and self._last_fetch is not None
+            and time.monotonic() - self._last_fetch < self.refresh_min_age
+        ):
+            _LOGGER.debug("%s: data younger than %ss, refresh skipped", self.location_key, self.refresh_min_age)
+            return
+        await super().async_request_refresh()
 
     async def _async_update_data(self):
+        """Update data, attaching concurrent callers to the fetch already in flight."""
+        if self._inflight is None:
+            self._inflight = self.hass.async_create_task(self._async_fetch_limited())
+            self._inflight.add_done_callback(self._async_fetch_done)
+        return await asyncio.shield(self._inflight)
+
+    def _async_fetch_done(self, task):
+        self._inflight = None
+        if not task.cancelled() and task.exception() is None:
+            self._last_fetch = time.monotonic()
+            self._async_schedule_interval(task.result()["model"])
+
+    def _calls_per_minute(self, minutes):
+        """Requests this coordinator makes per minute when ticking every minutes."""
+        if self.section_intervals:
+            rate = sum(1 / max(interval, minutes) for interval in self.section_intervals.values())
+        else:
+            rate = 1 / minutes
+        if self.life:
+            rate += 1 / 60
+        return rate
+
+    def _async_schedule_interval(self, model):
+        """Pick the next interval, adapted to the weather and stretched to fit the api quota."""
+        minutes = self._base_interval
+        if self.interval_bounds:
+            # poll faster when rain is near, back off to the ceiling in settled weather
+            minutes = adaptive_interval(model, *self.interval_bounds)
+        factor = self.client.quota.stretch_factor(self._calls_per_minute(minutes), self.client.shares)
+        minutes = min(round(minutes * factor), 1440)
+        if minutes != self.poll_interval:
+            _LOGGER.debug("%s: update every %s minutes", self.location_key, minutes)
+            self.poll_interval = minutes
+            # the stale window follows the interval
+            self._async_arm_expiry()
+        # land on this coordinator's own slot, away from the other entries
+        self.update_interval = datetime.timedelta(seconds=seconds_to_slot(minutes, self.phase))
+
+    async def _async_fetch_limited(self):
+        async with self._fetch_slots:
+            return await self._async_fetch_data()
+
+    async def _async_fetch_lifeindex(self):
+        async with timeout(10):
+            url = str.format("http://api.caiyunapp.com/v1/lifeindex/?token={}&lng={}&lat={}", self.api_key, self.longitude, self.latitude)
+            _LOGGER.debug("Requests remaining: %s", url)
+            return await self.client.get_json(url, "lifeindex")
+
+    async def _async_fetch_data(self):
         """Update data via library."""
+        # life index is refreshed once per local clock hour, alongside the main request
+        now = dt_util.now()
+        lifeindex_slot = now.strftime("%Y-%m-%d %H")
+        lifeindex_task = None
+        if self.life == True and self._lifeindex_slot != lifeindex_slot:
+            lifeindex_task = self.hass.async_create_task(self._async_fetch_lifeindex())
         try:
             async with timeout(10):
-                start_timestamp = int((datetime.datetime.now()+datetime.timedelta(days=self.starttime)).timestamp())
-                url = str.format("https://api.caiyunapp.com/{}/{}/{},{}/weather.json?dailysteps={}&hourlysteps={}&alert={}&unit={}&timestamp={}", self.api_version, self.api_key, self.longitude, self.latitude, self.dailysteps, self.hourlysteps, str(self.alert).lower(), self.is_metric, start_timestamp)
-                _LOGGER.debug("Requests remaining: %s", url)
-                # json_text = requests.get(url).content
-                resdata =  await self.hass.async_add_executor_job(self.get_data, url)
-        except (
-            ClientConnectorError
-        ) as error:
-            raise UpdateFailed(error)       
-        
-        
-        
-        if self.life == True and (int(datetime.datetime.now().timestamp()) - int(self._lifeindextime)) >= 3600:
-            lifeindexnewdata = {}
-            try:
-                async with timeout(10):
-                    url = str.format("http://api.caiyunapp.com/v1/lifeindex/?token={}&lng={}&lat={}", self.api_key, self.longitude, self.latitude)
+                if self.section_intervals:
+                    resdata = await self._async_fetch_sections()
+                else:
+                    url = self._section_url("weather")
                     _LOGGER.debug("Requests remaining: %s", url)
-                    # json_text = requests.get(url).content
-                    resdatalifeindex =  await self.hass.async_add_executor_job(self.get_data, url)
-            except (
-                ClientConnectorError
-            ) as error:
-                raise UpdateFailed(error)
-                    
-            if resdatalifeindex.get("result"):
-                lifeindexdata = resdatalifeindex.get("result")
-            else:        
-                lifeindexdata = resdata.get("result")['daily']['life_index']
-            for lifeindex in lifeindexdata:
-                if lifeindex != "meta":
-                    lifeindexk = {}
-                    if int(datetime.datetime.now().strftime("%H")) >= 18:
-                        #lifeindexnewdata[lifeindex] = lifeindexdata[lifeindex][1]                         
-                        for k in lifeindexdata[lifeindex][1]:
-                            if k == "date":
-                                lifeindexk["datetime"] = lifeindexdata[lifeindex][1].get("date")
-                            elif k == "detail":
-                                lifeindexk[k] = lifeindexdata[lifeindex][1].get(k).replace("今日","明日")                      
-                            else:
-                                lifeindexk[k] = lifeindexdata[lifeindex][1].get(k)
-                        lifeindexnewdata[lifeindex] = lifeindexk
+                    resdata = await self.client.get_json(url, "weather")
+
+            if lifeindex_task is not None:
+                try:
+                    resdatalifeindex = await lifeindex_task
+                    if resdatalifeindex.get("result"):
+                        lifeindexdata = resdatalifeindex.get("result")
                     else:
-                        for k in lifeindexdata[lifeindex][1]:
-                            if k == "date":
-                                lifeindexk["datetime"] = lifeindexdata[lifeindex][0].get("date")
-                            else:
-                                lifeindexk[k] = lifeindexdata[lifeindex][0].get(k)
-                        lifeindexnewdata[lifeindex] = lifeindexk
-            self._lifeindex = lifeindexnewdata
-            self._lifeindextime = int(datetime.datetime.now().timestamp())
-            
-        
-        return {**resdata,"lifeindex":self._lifeindex,"location_key":self.location_key,"is_metric":self.is_metric}
+                        lifeindexdata = resdata.get("result")['daily']['life_index']
+                    lifeindex = self._parse_lifeindex(lifeindexdata, now.hour)
+                except (ClientError, asyncio.TimeoutError, ValueError, KeyError, IndexError, TypeError, AttributeError) as error:
+                    # the weather payload still lands, only the life index is kept from before
+                    _LOGGER.warning("%s: life index update failed: %s", self.location_key, error)
+                    self._lifeindex_stale = True
+                else:
+                    self._lifeindex = lifeindex
+                    self._lifeindex_slot = lifeindex_slot
+                    self._lifeindex_stale = False
+        except (ClientError, asyncio.TimeoutError, ValueError) as error:
+            # ValueError: a body that is not json
+            raise UpdateFailed(error)
+        finally:
+            # never leave the life index request behind when the weather one failed
+            if lifeindex_task is not None:
+                if not lifeindex_task.done():
+                    lifeindex_task.cancel()
+                elif not lifeindex_task.cancelled():
+                    # retrieved, so a failure nobody awaited is not logged by asyncio
+                    lifeindex_task.exception()
+
+        # only a payload that parsed is worth restoring after a restart
+        try:
+            data = self._build_data(resdata)
+        except (KeyError, IndexError, TypeError, ValueError) as error:
+            raise UpdateFailed(f"unparsable payload: {error!r}")
+        self._async_save_snapshot(resdata)
+        return data
 
+    @staticmethod
+    def _parse_lifeindex(lifeindexdata, hour):
+        """Pick today's indexes, or tomorrow's from 18:00 on."""
+        lifeindexnewdata = {}
+        for lifeindex in lifeindexdata:
+            if lifeindex != "meta":
+                lifeindexk = {}
+                if hour >= 18:
+                    for k in lifeindexdata[lifeindex][1]:
+                        if k == "date":
+                            lifeindexk["datetime"] = lifeindexdata[lifeindex][1].get("date")
+                        elif k == "detail":
+                            lifeindexk[k] = lifeindexdata[lifeindex][1].get(k).replace("今日","明日")
+                        else:
+                            lifeindexk[k] = lifeindexdata[lifeindex][1].get(k)
+                    lifeindexnewdata[lifeindex] = lifeindexk
+                else:
+                    for k in lifeindexdata[lifeindex][1]:
+                        if k == "date":
+                            lifeindexk["datetime"] = lifeindexdata[lifeindex][0].get("date")
+                        else:
+                            lifeindexk[k] = lifeindexdata[lifeindex][0].get(k)
+                    lifeindexnewdata[lifeindex] = lifeindexk
+        return lifeindexnewdata
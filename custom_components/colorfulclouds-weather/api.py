@@ -0,0 +1,91 @@
+"""Shared http client for the caiyun api."""
+import logging
+
+import aiohttp
+
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import (
+    CLIENTS,
+    DOMAIN,
+    REQUEST_CONNECT_TIMEOUT,
+    REQUEST_READ_TIMEOUT,
+)
+from .quota import QuotaManager
+
+_LOGGER = logging.getLogger(__name__)
+
+USER_AGENT = 'ColorfulCloudsPro/6.7.2 (iPhone; iOS 16.2; Scale/3.00)'
+DEVICE_ID = 'D9AB80E9-B5CE-40FD-96CD-8E38CF5287B7'
+APP_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'device-id': DEVICE_ID,
+    'Accept': 'application/json',
+    'Accept-Language': 'zh-Hans-CN;q=1',
+    'app-version': '6.7.2',
+    'app_name': 'weather',
+    'app-name': 'weather',
+}
+BASE_HEADERS = {
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+
+class ColorfulCloudsClient:
+    """One client per api key, shared by every coordinator using that key."""
+
+    def __init__(self, session, api_key, quota):
+        """Initialize."""
+        self.api_key = api_key
+        self.quota = quota
+        self._session = session
+        self._users = set()
+        if str(api_key)[0:6] == "UR8ASa":
+            self._headers = {**APP_HEADERS, **BASE_HEADERS}
+        else:
+            self._headers = dict(BASE_HEADERS)
+        self._timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=REQUEST_CONNECT_TIMEOUT, sock_read=REQUEST_READ_TIMEOUT
+        )
+
+    @property
+    def shares(self):
+        """Number of coordinators polling with this api key."""
+        return len(self._users)
+
+    async def get_json(self, url, endpoint):
+        """Fetch url over the pooled keep-alive connections and decode the json body."""
+        self.quota.async_record(endpoint)
+        async with self._session.get(url, headers=self._headers, timeout=self._timeout) as response:
+            response.raise_for_status()
+            # caiyun does not always send application/json
+            return await response.json(content_type=None)
+
+
+async def async_get_client(hass, api_key, user, daily_quota):
+    """Return the shared client for api_key, registering user (a coordinator key) on it."""
+    clients = hass.data[DOMAIN].setdefault(CLIENTS, {})
+    client = clients.get(api_key)
+    if client is None:
+        quota = QuotaManager(hass, api_key, daily_quota)
+        await quota.async_load()
+        # another entry may have registered the key while the counts loaded
+        client = clients.setdefault(
+            api_key, ColorfulCloudsClient(async_get_clientsession(hass), api_key, quota)
+        )
+        _LOGGER.debug("Created shared client for api key %s***", str(api_key)[0:6])
+    client.quota.daily_quota = daily_quota
+    client._users.add(user)
+    return client
+
+
+def async_release_client(hass, api_key, user):
+    """Drop user from the client users, forgetting the client once unused."""
+    clients = hass.data[DOMAIN].get(CLIENTS, {})
+    client = clients.get(api_key)
+    if client is None:
+        return
+    client._users.discard(user)
+    if not client._users:
+        clients.pop(api_key)
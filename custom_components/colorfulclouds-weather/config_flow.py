@@ -17,6 +17,23 @@ from .const import (
     CONF_LIFEINDEX,
     CONF_STARTTIME,
     CONF_UPDATE_INTERVAL,
+    CONF_REFRESH_WINDOW,
+    CONF_REFRESH_MIN_AGE,
+    CONF_SPLIT_ENDPOINTS,
+    CONF_ADAPTIVE_INTERVAL,
+    CONF_MIN_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_DAILY_QUOTA,
+    CONF_GRID_TOLERANCE,
+    CONF_FORECAST_ATTRIBUTES,
+    CONF_HEARTBEAT_INTERVAL,
+    CONF_STALE_AFTER,
+    DEFAULT_GRID_TOLERANCE,
+    DEFAULT_HEARTBEAT_INTERVAL,
+    DEFAULT_STALE_AFTER,
+    FORECAST_ATTRIBUTE_FORMATS,
+    FORECAST_ATTRIBUTES_ROW,
+    SECTION_INTERVALS,
     )
 import voluptuous as vol
 
@@ -112,6 +129,13 @@ class colorfulclouds_weatherOptionsFlow(config_entries.OptionsFlow):
         if user_input is not None:
             return self.async_create_entry(title="", data=user_input)
 
+        section_intervals = {
+            vol.Optional(
+                option,
+                default=self.config_entry.options.get(option, default),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440))
+            for option, default in SECTION_INTERVALS.values()
+        }
         return self.async_show_form(
             step_id="user",
             data_schema=vol.Schema(
@@ -139,7 +163,52 @@ class colorfulclouds_weatherOptionsFlow(config_entries.OptionsFlow):
                     vol.Optional(
                         CONF_LIFEINDEX,
                         default=self.config_entry.options.get(CONF_LIFEINDEX, False),
-                    ): bool
+                    ): bool,
+                    vol.Optional(
+                        CONF_REFRESH_WINDOW,
+                        default=self.config_entry.options.get(CONF_REFRESH_WINDOW, 10),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=300)),
+                    vol.Optional(
+                        CONF_REFRESH_MIN_AGE,
+                        default=self.config_entry.options.get(CONF_REFRESH_MIN_AGE, 60),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                    vol.Optional(
+                        CONF_SPLIT_ENDPOINTS,
+                        default=self.config_entry.options.get(CONF_SPLIT_ENDPOINTS, False),
+                    ): bool,
+                    **section_intervals,
+                    vol.Optional(
+                        CONF_ADAPTIVE_INTERVAL,
+                        default=self.config_entry.options.get(CONF_ADAPTIVE_INTERVAL, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_MIN_INTERVAL,
+                        default=self.config_entry.options.get(CONF_MIN_INTERVAL, 5),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440)),
+                    vol.Optional(
+                        CONF_MAX_INTERVAL,
+                        default=self.config_entry.options.get(CONF_MAX_INTERVAL, 60),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440)),
+                    vol.Optional(
+                        CONF_DAILY_QUOTA,
+                        default=self.config_entry.options.get(CONF_DAILY_QUOTA, 10000),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                    vol.Optional(
+                        CONF_GRID_TOLERANCE,
+                        default=self.config_entry.options.get(CONF_GRID_TOLERANCE, DEFAULT_GRID_TOLERANCE),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=10000)),
+                    vol.Optional(
+                        CONF_FORECAST_ATTRIBUTES,
+                        default=self.config_entry.options.get(CONF_FORECAST_ATTRIBUTES, FORECAST_ATTRIBUTES_ROW),
+                    ): vol.In(FORECAST_ATTRIBUTE_FORMATS),
+                    vol.Optional(
+                        CONF_HEARTBEAT_INTERVAL,
+                        default=self.config_entry.options.get(CONF_HEARTBEAT_INTERVAL, DEFAULT_HEARTBEAT_INTERVAL),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1440)),
+                    vol.Optional(
+                        CONF_STALE_AFTER,
+                        default=self.config_entry.options.get(CONF_STALE_AFTER, DEFAULT_STALE_AFTER),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=5, max=1440)),
                 }
             ),
         )
@@ -66,8 +66,91 @@ CONF_HOURLYSTEPS = "hourlysteps"
 CONF_DAILYSTEPS = "dailysteps"
 CONF_STARTTIME = "starttime"
 CONF_UPDATE_INTERVAL = "update_interval_minutes"
+CONF_REFRESH_WINDOW = "refresh_window"
+CONF_REFRESH_MIN_AGE = "refresh_min_age"
+CONF_SPLIT_ENDPOINTS = "split_endpoints"
+CONF_REALTIME_INTERVAL = "realtime_interval_minutes"
+CONF_MINUTELY_INTERVAL = "minutely_interval_minutes"
+CONF_HOURLY_INTERVAL = "hourly_interval_minutes"
+CONF_DAILY_INTERVAL = "daily_interval_minutes"
+CONF_ADAPTIVE_INTERVAL = "adaptive_interval"
+CONF_MIN_INTERVAL = "min_interval_minutes"
+CONF_MAX_INTERVAL = "max_interval_minutes"
+CONF_DAILY_QUOTA = "daily_quota"
+CONF_GRID_TOLERANCE = "grid_tolerance"
+CONF_FORECAST_ATTRIBUTES = "forecast_attributes"
+CONF_HEARTBEAT_INTERVAL = "heartbeat_interval_minutes"
+CONF_STALE_AFTER = "stale_after_minutes"
+
+# how the weather entity embeds its forecast lists in the state attributes
+FORECAST_ATTRIBUTES_ROW = "row"
+FORECAST_ATTRIBUTES_COLUMNAR = "columnar"
+FORECAST_ATTRIBUTES_OMITTED = "omitted"
+FORECAST_ATTRIBUTE_FORMATS = (
+    FORECAST_ATTRIBUTES_ROW,
+    FORECAST_ATTRIBUTES_COLUMNAR,
+    FORECAST_ATTRIBUTES_OMITTED,
+)
+# bumped whenever the columnar layout changes, the card checks it
+COLUMNAR_FORMAT_VERSION = 1
+
+# endpoint -> (option, default minutes) when polling the endpoints separately
+SECTION_INTERVALS = {
+    "realtime": (CONF_REALTIME_INTERVAL, 10),
+    "minutely": (CONF_MINUTELY_INTERVAL, 5),
+    "hourly": (CONF_HOURLY_INTERVAL, 30),
+    "daily": (CONF_DAILY_INTERVAL, 120),
+}
 
 COORDINATOR = "coordinator"
+CLIENTS = "clients"
+COORDINATORS = "coordinators"
+FETCH_SLOTS = "fetch_slots"
+SUPPRESSED_WRITES = "suppressed_writes"
+
+MAX_CONCURRENT_FETCHES = 4
+# seconds, cached entries revalidate spread over this window after startup
+STARTUP_SPREAD = 60
+
+STORAGE_VERSION = 1
+# seconds, batches cache writes behind the latest payload
+STORAGE_SAVE_DELAY = 30
+
+# seconds, applied per request on top of the coordinator's overall timeout
+REQUEST_CONNECT_TIMEOUT = 5
+REQUEST_READ_TIMEOUT = 10
+
+# minutes after server_time the entities turn unavailable without a newer payload
+DEFAULT_STALE_AFTER = 30
+# minutes of slack on top of 1.5 poll intervals (a slot may land that late),
+# the stale window never ends before the next poll is due
+STALE_MARGIN = 5
+
+# minutes, an unchanged entity still writes its state this often
+DEFAULT_HEARTBEAT_INTERVAL = 60
+
+# meters, 0 queries every entry at its own coordinates
+DEFAULT_GRID_TOLERANCE = 0
+
+# option -> default of everything the coordinator reads; entries in one grid
+# cell agreeing on all of them, defaults filled in, share a coordinator
+REQUEST_OPTIONS = {
+    CONF_DAILYSTEPS: 5,
+    CONF_HOURLYSTEPS: 24,
+    CONF_ALERT: True,
+    CONF_LIFEINDEX: False,
+    CONF_STARTTIME: 0,
+    CONF_UPDATE_INTERVAL: 10,
+    CONF_REFRESH_WINDOW: 10,
+    CONF_REFRESH_MIN_AGE: 60,
+    CONF_SPLIT_ENDPOINTS: False,
+    CONF_ADAPTIVE_INTERVAL: False,
+    CONF_MIN_INTERVAL: 5,
+    CONF_MAX_INTERVAL: 60,
+    CONF_DAILY_QUOTA: 10000,
+    CONF_STALE_AFTER: DEFAULT_STALE_AFTER,
+    **dict(SECTION_INTERVALS.values()),
+}
 
 UNDO_UPDATE_LISTENER = "undo_update_listener"
 
@@ -175,3 +258,109 @@ SENSOR_TYPES = {
 
 
 
+
+# offsets of the forecast sensors, every one of them starts disabled
+FORECAST_HOURS = (1, 3, 6, 12, 24)
+PRECIPITATION_WINDOWS = (1, 3, 6, 12, 24)
+FORECAST_DAYS = (0, 1, 2, 3, 4)
+ATTR_OFFSETS = "offsets"
+DAY_LABELS = ("今天", "明天", "后天")
+
+# kind -> forecast sensor, {} in the label takes the hours or the DAY_LABELS of the offset
+FORECAST_SENSOR_TYPES = {
+    "hourly_temperature": {
+        ATTR_DEVICE_CLASS: DEVICE_CLASS_TEMPERATURE,
+        ATTR_ICON: None,
+        ATTR_LABEL: "{}小时后温度",
+        ATTR_UNIT_METRIC: TEMP_CELSIUS,
+        ATTR_UNIT_IMPERIAL: TEMP_FAHRENHEIT,
+        ATTR_OFFSETS: FORECAST_HOURS,
+    },
+    "hourly_precipitation": {
+        ATTR_DEVICE_CLASS: None,
+        ATTR_ICON: "mdi:weather-rainy",
+        ATTR_LABEL: "{}小时后雨量",
+        ATTR_UNIT_METRIC: "mm",
+        ATTR_UNIT_IMPERIAL: LENGTH_INCHES,
+        ATTR_OFFSETS: FORECAST_HOURS,
+    },
+    "hourly_probability": {
+        ATTR_DEVICE_CLASS: None,
+        ATTR_ICON: "mdi:umbrella-outline",
+        ATTR_LABEL: "{}小时后降水概率",
+        ATTR_UNIT_METRIC: "%",
+        ATTR_UNIT_IMPERIAL: "%",
+        ATTR_OFFSETS: FORECAST_HOURS,
+    },
+    "precipitation_sum": {
+        ATTR_DEVICE_CLASS: None,
+        ATTR_ICON: "mdi:weather-pouring",
+        ATTR_LABEL: "未来{}小时累计雨量",
+        ATTR_UNIT_METRIC: "mm",
+        ATTR_UNIT_IMPERIAL: LENGTH_INCHES,
+        ATTR_OFFSETS: PRECIPITATION_WINDOWS,
+    },
+    "daily_temperature_max": {
+        ATTR_DEVICE_CLASS: DEVICE_CLASS_TEMPERATURE,
+        ATTR_ICON: None,
+        ATTR_LABEL: "{}最高温度",
+        ATTR_UNIT_METRIC: TEMP_CELSIUS,
+        ATTR_UNIT_IMPERIAL: TEMP_FAHRENHEIT,
+        ATTR_OFFSETS: FORECAST_DAYS,
+    },
+    "daily_temperature_min": {
+        ATTR_DEVICE_CLASS: DEVICE_CLASS_TEMPERATURE,
+        ATTR_ICON: None,
+        ATTR_LABEL: "{}最低温度",
+        ATTR_UNIT_METRIC: TEMP_CELSIUS,
+        ATTR_UNIT_IMPERIAL: TEMP_FAHRENHEIT,
+        ATTR_OFFSETS: FORECAST_DAYS,
+    },
+    "daily_precipitation": {
+        ATTR_DEVICE_CLASS: None,
+        ATTR_ICON: "mdi:weather-rainy",
+        ATTR_LABEL: "{}雨量",
+        ATTR_UNIT_METRIC: "mm",
+        ATTR_UNIT_IMPERIAL: LENGTH_INCHES,
+        ATTR_OFFSETS: FORECAST_DAYS,
+    },
+    "daily_condition": {
+        ATTR_DEVICE_CLASS: None,
+        ATTR_ICON: "mdi:weather-partly-cloudy",
+        ATTR_LABEL: "{}天气",
+        ATTR_UNIT_METRIC: None,
+        ATTR_UNIT_IMPERIAL: None,
+        ATTR_OFFSETS: FORECAST_DAYS,
+    },
+}
+
+# minutes ahead of the nowcast intensity sensors
+NOWCAST_MINUTES = (0, 15, 30, 60)
+
+# kind -> nowcast sensor, read from result.minutely.precipitation_2h
+NOWCAST_SENSOR_TYPES = {
+    "minutely_precipitation": {
+        ATTR_DEVICE_CLASS: None,
+        ATTR_ICON: "mdi:weather-pouring",
+        ATTR_LABEL: "{}分钟后降水强度",
+        ATTR_UNIT_METRIC: "mm/h",
+        ATTR_UNIT_IMPERIAL: "in/h",
+        ATTR_OFFSETS: NOWCAST_MINUTES,
+    },
+    "minutely_rain_starts": {
+        ATTR_DEVICE_CLASS: None,
+        ATTR_ICON: "mdi:umbrella",
+        ATTR_LABEL: "距离降水开始",
+        ATTR_UNIT_METRIC: "min",
+        ATTR_UNIT_IMPERIAL: "min",
+        ATTR_OFFSETS: (0,),
+    },
+    "minutely_rain_stops": {
+        ATTR_DEVICE_CLASS: None,
+        ATTR_ICON: "mdi:umbrella-closed",
+        ATTR_LABEL: "距离降水结束",
+        ATTR_UNIT_METRIC: "min",
+        ATTR_UNIT_IMPERIAL: "min",
+        ATTR_OFFSETS: (0,),
+    },
+}
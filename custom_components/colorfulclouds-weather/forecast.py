@@ -0,0 +1,327 @@
+"""Forecast rows and derived attributes, built once per payload."""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import time
+
+from homeassistant.components.weather import (
+    ATTR_FORECAST_CONDITION,
+    ATTR_FORECAST_IS_DAYTIME,
+    ATTR_FORECAST_NATIVE_PRECIPITATION,
+    ATTR_FORECAST_NATIVE_TEMP,
+    ATTR_FORECAST_NATIVE_TEMP_LOW,
+    ATTR_FORECAST_NATIVE_WIND_SPEED,
+    ATTR_FORECAST_PRECIPITATION_PROBABILITY,
+    ATTR_FORECAST_TIME,
+    ATTR_FORECAST_WIND_BEARING,
+)
+
+from .const import COLUMNAR_FORMAT_VERSION
+from .model import SKYCONS
+from .summary import PrecipitationSummary
+from .wind import beaufort, beaufort_series, wind_direction, wind_direction_series
+
+_LOGGER = logging.getLogger(__name__)
+
+# hours, extra summary windows published next to the full range one
+SUMMARY_HORIZONS = (6, 24, 72)
+
+CONDITION_MAP = {
+    'CLEAR_DAY': 'sunny',
+    'CLEAR_NIGHT': 'clear-night',
+    'PARTLY_CLOUDY_DAY': 'partlycloudy',
+    'PARTLY_CLOUDY_NIGHT':'partlycloudy',
+    'CLOUDY': 'cloudy',
+    'LIGHT_HAZE': 'fog',
+    'MODERATE_HAZE': 'fog',
+    'HEAVY_HAZE': 'fog',
+    'LIGHT_RAIN': 'rainy',
+    'MODERATE_RAIN': 'rainy',
+    'HEAVY_RAIN': 'pouring',
+    'STORM_RAIN': 'pouring',
+    'FOG': 'fog',
+    'LIGHT_SNOW': 'snowy',
+    'MODERATE_SNOW': 'snowy',
+    'HEAVY_SNOW': 'snowy',
+    'STORM_SNOW': 'snowy',
+    'DUST': 'fog',
+    'SAND': 'fog',
+    'THUNDER_SHOWER': 'lightning-rainy',
+    'HAIL': 'hail',
+    'SLEET': 'snowy-rainy',
+    'WIND': 'windy',
+    'HAZE': 'fog',
+    'RAIN': 'rainy',
+    'SNOW': 'snowy',
+}
+
+CONDITION_CN_MAP = {
+    'CLEAR_DAY': '晴',
+    'CLEAR_NIGHT': '晴',
+    'PARTLY_CLOUDY_DAY': '多云',
+    'PARTLY_CLOUDY_NIGHT':'多云',
+    'CLOUDY': '阴',
+    'LIGHT_HAZE': '轻雾',
+    'MODERATE_HAZE': '中雾',
+    'HEAVY_HAZE': '大雾',
+    'LIGHT_RAIN': '小雨',
+    'MODERATE_RAIN': '中雨',
+    'HEAVY_RAIN': '大雨',
+    'STORM_RAIN': '暴雨',
+    'FOG': '雾',
+    'LIGHT_SNOW': '小雪',
+    'MODERATE_SNOW': '中雪',
+    'HEAVY_SNOW': '大雪',
+    'STORM_SNOW': '暴雪',
+    'DUST': '浮尘',
+    'SAND': '沙尘',
+    'THUNDER_SHOWER': '雷阵雨',
+    'HAIL': '冰雹',
+    'SLEET': '雨夹雪',
+    'WIND': '大风',
+    'HAZE': '雾霾',
+    'RAIN': '雨',
+    'SNOW': '雪',
+}
+
+TRANSLATE_SUGGESTION = {
+    'AnglingIndex': '钓鱼指数',
+    'AirConditionerIndex': '空调开机指数',
+    'AllergyIndex': '过敏指数',
+    'HeatstrokeIndex': '中暑指数',
+    'RainGearIndex': '雨具指数',
+    'DryingIndex': '晾晒指数',
+    'WindColdIndex': '风寒指数',
+    'KiteIndex': '风筝指数',
+    'MorningExerciseIndex': '晨练指数',
+    'UltravioletIndex': '紫外线指数',
+    'DrinkingIndex': '饮酒指数',
+    'ComfortIndex': '舒适指数',
+    'CarWashingIndex': '洗车指数',
+    'DressingIndex': '穿衣指数',
+    'ColdRiskIndex': '感冒指数',
+    'AQIIndex': '空气污染指数',
+    'WashClothesIndex': '洗衣指数',
+    'MakeUpIndex': '化妆指数',
+    'MoodIndex': '情绪指数',
+    'SportIndex': '运动指数',
+    'TravelIndex': '旅游指数',
+    'DatingIndex': '交友指数',
+    'ShoppingIndex': '逛街指数',
+    'HairdressingIndex': '美发指数',
+    'NightLifeIndex': '夜生活',
+    'BoatingIndex': '划船指数',
+    'RoadConditionIndex': '路况指数',
+    'TrafficIndex': '交通指数',
+    'ultraviolet': '紫外线',
+    'carWashing': '洗车指数',
+    'dressing': '穿衣指数',
+    'comfort': '舒适度指数',
+    'coldRisk': '感冒指数',
+}
+
+
+def _daily(model):
+    daily = model.daily
+    winddirs = wind_direction_series(daily.wind_direction)
+    windlevels = beaufort_series(daily.wind_speed)
+    forecast_data = []
+    for i in range(len(daily)):
+        skycon = SKYCONS[daily.skycon[i]]
+        data_dict = {
+            ATTR_FORECAST_TIME: datetime.combine(daily.date_at(i), datetime.min.time()),
+            ATTR_FORECAST_CONDITION: CONDITION_MAP[skycon],
+            "skycon": skycon,
+            "condition_cn": CONDITION_CN_MAP[skycon],
+            ATTR_FORECAST_NATIVE_PRECIPITATION: daily.precipitation[i],
+            ATTR_FORECAST_NATIVE_TEMP: int(daily.temperature_max[i]),
+            ATTR_FORECAST_NATIVE_TEMP_LOW: int(daily.temperature_min[i]),
+            ATTR_FORECAST_WIND_BEARING: daily.wind_direction[i],
+            ATTR_FORECAST_NATIVE_WIND_SPEED: daily.wind_speed[i],
+            "winddir": winddirs[i],
+            "windscale": windlevels[i].level,
+            "sundata": daily.astro[i]
+        }
+        forecast_data.append(data_dict)
+
+    return forecast_data
+
+
+def _twice_daily(model):
+    daily = model.daily
+    halves = []
+    for half, is_daytime, hour in ((daily.day, True, 8), (daily.night, False, 20)):
+        halves.append((
+            half,
+            is_daytime,
+            timedelta(hours=hour),
+            wind_direction_series(half.wind_direction),
+            beaufort_series(half.wind_speed),
+        ))
+    midnight = datetime.combine(daily.start, datetime.min.time(), daily.tzinfo) if len(daily) else None
+    forecast_data = []
+    for i in range(len(daily)):
+        for half, is_daytime, offset, winddirs, windlevels in halves:
+            skycon = SKYCONS[half.skycon[i]]
+            condition = CONDITION_MAP[skycon]
+            if not is_daytime and condition == 'sunny':
+                condition = 'clear-night'
+            probability = half.probability[i]
+            forecast_data.append({
+                ATTR_FORECAST_TIME: (midnight + timedelta(days=i) + offset).isoformat(),
+                ATTR_FORECAST_IS_DAYTIME: is_daytime,
+                ATTR_FORECAST_CONDITION: condition,
+                "skycon": skycon,
+                "condition_cn": CONDITION_CN_MAP[skycon],
+                ATTR_FORECAST_NATIVE_TEMP: half.temperature_max[i],
+                ATTR_FORECAST_NATIVE_TEMP_LOW: half.temperature_min[i],
+                ATTR_FORECAST_NATIVE_PRECIPITATION: half.precipitation[i],
+                ATTR_FORECAST_PRECIPITATION_PROBABILITY: None if probability != probability else probability,
+                ATTR_FORECAST_WIND_BEARING: half.wind_direction[i],
+                ATTR_FORECAST_NATIVE_WIND_SPEED: half.wind_speed[i],
+                "winddir": winddirs[i],
+                "windscale": windlevels[i].level,
+            })
+    return forecast_data
+
+
+def _hourly(model):
+    hourly = model.hourly
+    winddirs = wind_direction_series(hourly.wind_direction)
+    windlevels = beaufort_series(hourly.wind_speed)
+    timeline = hourly.timeline()
+    hourly_forecast_data = []
+    for i in range(len(hourly)):
+        skycon = SKYCONS[hourly.skycon[i]]
+        if hourly.probability[i] == hourly.probability[i] and hourly.probability[i]:
+            pop = str(round(hourly.probability[i]))
+        else:
+            pop = 0
+
+        hourly_forecastItem = {
+            'skycon': skycon,
+            ATTR_FORECAST_NATIVE_TEMP: round(hourly.temperature[i]),
+            'humidity': round(hourly.humidity[i],2),
+            'cloudrate': hourly.cloudrate[i],
+            ATTR_FORECAST_NATIVE_WIND_SPEED: hourly.wind_speed[i],
+            ATTR_FORECAST_WIND_BEARING: hourly.wind_direction[i],
+            'visibility': hourly.visibility[i],
+            'aqi': {'chn': hourly.aqi_chn[i], 'usa': hourly.aqi_usa[i]},
+            'pm25': hourly.pm25[i],
+            'datetime': timeline[i],
+            ATTR_FORECAST_NATIVE_PRECIPITATION: hourly.precipitation[i],
+            'probable_precipitation': pop,
+            'condition': CONDITION_MAP[skycon],
+            'condition_cn': CONDITION_CN_MAP[skycon],
+            "winddir": winddirs[i],
+            "windscale": windlevels[i].level
+        }
+        hourly_forecast_data.append(hourly_forecastItem)
+    return hourly_forecast_data
+
+
+def precipitation_summary(model):
+    """Return the PrecipitationSummary of the hourly forecast of model."""
+    hourly = model.hourly
+    conditions = [CONDITION_CN_MAP[SKYCONS[code]] for code in hourly.skycon]
+    return PrecipitationSummary(hourly.precipitation, hourly.hours(), conditions)
+
+
+@dataclass(slots=True)
+class Forecasts:
+    """Everything derived from the forecast columns of one payload."""
+
+    daily: list
+    twice_daily: list
+    hourly: list
+    hourly_summary: str
+    hourly_summaries: dict
+    precipitation: PrecipitationSummary
+    hourly_pm25: list
+    suggestion: list
+    winddir: str
+    windscale: str
+    _columns: dict = field(default_factory=dict)
+    _digests: dict = field(default_factory=dict)
+
+    def columns(self, name):
+        """Return the list attribute name in columnar form, encoded once per payload."""
+        if name not in self._columns:
+            self._columns[name] = to_columns(getattr(self, name))
+        return self._columns[name]
+
+    def digest(self, name):
+        """Return a content hash of the list attribute name, computed once per payload."""
+        if name not in self._digests:
+            encoded = json.dumps(getattr(self, name), default=str, ensure_ascii=False)
+            self._digests[name] = hashlib.sha1(encoded.encode()).hexdigest()
+        return self._digests[name]
+
+
+def to_columns(rows):
+    """Return rows as one list per key, {"format_version": 1, "datetime": [...], ...}.
+
+    Every row of a forecast list carries the same keys, so the keys are sent
+    once instead of once per row.
+    """
+    columns = {"format_version": COLUMNAR_FORMAT_VERSION}
+    if rows:
+        for key in rows[0]:
+            columns[key] = [row[key] for row in rows]
+    return columns
+
+
+def build_forecasts(model):
+    """Build the forecast lists and derived attributes of model."""
+    start = time.perf_counter()
+    hourly = model.hourly
+    precipitation = precipitation_summary(model)
+    # today/tomorrow is judged against one clock reading per build
+    now_hour = datetime.now().hour
+    forecasts = Forecasts(
+        daily=_daily(model),
+        twice_daily=_twice_daily(model),
+        hourly=_hourly(model),
+        hourly_summary=precipitation.text(now_hour=now_hour),
+        hourly_summaries={
+            f"{horizon}h": precipitation.text(horizon=horizon, now_hour=now_hour)
+            for horizon in SUMMARY_HORIZONS
+        },
+        precipitation=precipitation,
+        hourly_pm25=[
+            {'datetime': stamp, 'value': value}
+            for stamp, value in zip(hourly.timeline('T', offset=True), hourly.pm25)
+        ],
+        suggestion=[
+            {'title': k, 'title_cn': TRANSLATE_SUGGESTION.get(k, k), 'brf': v.get('desc'), 'txt': v.get('detail')}
+            for k, v in model.lifeindex.items()
+        ],
+        winddir=wind_direction(model.realtime.wind_direction),
+        windscale=beaufort(model.realtime.wind_speed).level,
+    )
+    _LOGGER.debug("Built forecasts in %.1f ms", (time.perf_counter() - start) * 1000)
+    return forecasts
+
+
+class ForecastCache:
+    """Serve the Forecasts of a payload until the next one arrives.
+
+    Keyed on server_time plus the options the rows depend on, so every state
+    write and forecast subscription of a poll shares one build.
+    """
+
+    def __init__(self, options=()):
+        """Initialize."""
+        self._options = tuple(options)
+        self._key = None
+        self._forecasts = None
+
+    def get(self, model):
+        """Return the Forecasts of model, building them on first use."""
+        key = (model.server_time, id(model), self._options)
+        if key != self._key:
+            self._forecasts = build_forecasts(model)
+            self._key = key
+        return self._forecasts
@@ -14743,6 +14743,47 @@
 
   Chart.register(...registerables, plugin);
 
+  // forecast attributes come as a list of rows, or as {format_version, key: [values]}
+  // columns when the integration is set to the compact encoding
+  const FORECAST_FORMAT_VERSION = 1;
+  const decodedForecasts = new WeakMap();
+
+  function forecastRows(value) {
+    if (!value || Array.isArray(value)) {
+      return value || [];
+    }
+    if (decodedForecasts.has(value)) {
+      return decodedForecasts.get(value);
+    }
+    if (value.format_version !== FORECAST_FORMAT_VERSION) {
+      console.warn('Unsupported forecast format_version', value.format_version);
+      return [];
+    }
+    const keys = Object.keys(value).filter((key) => key !== 'format_version');
+    const length = keys.length ? value[keys[0]].length : 0;
+    const rows = new Array(length);
+    for (let i = 0; i < length; i++) {
+      const row = {};
+      for (const key of keys) {
+        row[key] = value[key][i];
+      }
+      rows[i] = row;
+    }
+    decodedForecasts.set(value, rows);
+    return rows;
+  }
+
+  // rows pushed by weather/subscribe_forecast carry converted keys, the card reads native_*
+  function nativeForecastRows(rows) {
+    return (rows || []).map((row) => ({
+      native_temperature: row.temperature,
+      native_templow: row.templow,
+      native_precipitation: row.precipitation,
+      native_wind_speed: row.wind_speed,
+      ...row,
+    }));
+  }
+
   class WeatherChartCard extends s {
 
     static getStubConfig() {
@@ -14781,6 +14822,7 @@
         forecastChart: {type: Object},
 		forecasthourlyChart: {type: Object},
 		hourly_forecast: {type: Object},
+		subscribedForecasts: {type: Object},
         forecastItems: {type: Number},
         iconSize: {type: Number}
       };
@@ -14804,6 +14846,9 @@
         this.pressure = this.weather.attributes.pressure;
         this.windSpeed = this.weather.attributes.wind_speed;
         this.windDirection = this.weather.attributes.wind_bearing;
+        if (!this.weather.attributes.daily_forecast) {
+          this.subscribeForecasts();
+        }
       }
 	
       this.iconSize = this.config.icons_size ? this.config.icons_size : 22;
@@ -14817,6 +14862,48 @@
       super();
     }
 
+    // forecasts kept out of the state attributes are fetched over the subscription api
+    subscribeForecasts() {
+      if (this._forecastSubscriptions || !this._hass.connection) {
+        return;
+      }
+      this._forecastSubscriptions = ['daily', 'hourly'].map((forecastType) =>
+        this._hass.connection.subscribeMessage(
+          (event) => {
+            this.subscribedForecasts = {
+              ...this.subscribedForecasts,
+              [forecastType]: nativeForecastRows(event.forecast),
+            };
+          },
+          {type: 'weather/subscribe_forecast', forecast_type: forecastType, entity_id: this.config.entity}
+        )
+      );
+    }
+
+    disconnectedCallback() {
+      super.disconnectedCallback();
+      if (this._forecastSubscriptions) {
+        this._forecastSubscriptions.forEach((subscription) =>
+          subscription.then((unsubscribe) => unsubscribe()).catch(() => {}));
+        this._forecastSubscriptions = undefined;
+      }
+    }
+
+    connectedCallback() {
+      super.connectedCallback();
+      if (this._hass && this.weather && !this.weather.attributes.daily_forecast) {
+        this.subscribeForecasts();
+      }
+    }
+
+    forecastList(forecastType) {
+      const attribute = this.weather && this.weather.attributes[forecastType + '_forecast'];
+      if (attribute) {
+        return forecastRows(attribute);
+      }
+      return this.subscribedForecasts ? this.subscribedForecasts[forecastType] : undefined;
+    }
+
     ll(str) {
       if (locale[this.language] === undefined) return locale.en[str];
       return locale[this.language][str];
@@ -14884,6 +14971,9 @@
       }    if (changedProperties.has('weather')) {
         this.updateChart();
 		this.updateCharthourly();
+      }    if (changedProperties.has('subscribedForecasts')) {
+        this.drawChart();
+		this.drawCharthourly();
       }  }
 
     measureCard() {
@@ -14895,7 +14985,7 @@
     }
 
     drawChart({config, language, weather, forecastItems} = this) {
-      if (!weather || !weather.attributes || !weather.attributes.daily_forecast) {
+      if (!weather || !weather.attributes || !this.forecastList('daily')) {
         return [];
       }
       if (this.forecastChart) {
@@ -14908,7 +14998,7 @@
       var tempUnit = this._hass.config.unit_system.temperature;
       var lengthUnit = this._hass.config.unit_system.length;
       var precipUnit = lengthUnit === 'km' ? this.ll('units')['mm'] : this.ll('units')['in'];
-      var forecast = weather.attributes.daily_forecast.slice(0, forecastItems);
+      var forecast = this.forecastList('daily').slice(0, forecastItems);
 	  console.log(forecast)      
     if ((new Date(forecast[1].datetime) - new Date(forecast[0].datetime)) < 864e5)
         var mode = 'hourly';
@@ -15097,7 +15187,7 @@
 	
     drawCharthourly({config, language, weather, forecastItems} = this) {
 	  
-      if (!weather || !weather.attributes || !weather.attributes.hourly_forecast) {
+      if (!weather || !weather.attributes || !this.forecastList('hourly')) {
         return [];
       }
       if (this.forecasthourlyChart) {
@@ -15111,7 +15201,7 @@
       var lengthUnit = this._hass.config.unit_system.length;
 	  var precipUnit = lengthUnit === 'km' ? this.ll('units')['mm'] : this.ll('units')['in'];
       var popUnit = '%';
-      var forecasthourly = weather.attributes.hourly_forecast.slice(0, forecastItems);
+      var forecasthourly = this.forecastList('hourly').slice(0, forecastItems);
 	  console.log(forecasthourly)
       if ((new Date(forecasthourly[1].datetime) - new Date(forecasthourly[0].datetime)) < 864e5)
         var mode = 'hourly';
@@ -15353,10 +15443,10 @@
 	
 
     updateChart({weather, forecastItems, forecastChart} = this) {
-      if (!weather || !weather.attributes || !weather.attributes.daily_forecast) {
+      if (!weather || !weather.attributes || !this.forecastList('daily')) {
         return [];
       }
-      var forecast = weather.attributes.daily_forecast.slice(0, forecastItems);
+      var forecast = this.forecastList('daily').slice(0, forecastItems);
       var i;
       var dateTime = [];
       var tempHigh = [];
@@ -15490,7 +15580,7 @@
 		// }	
 	
 	
-    if (!weather || !weather.attributes || !weather.attributes.daily_forecast) {
+    if (!weather || !weather.attributes || !this.forecastList('daily')) {
       return p`
         <style>
           .card {
@@ -15507,8 +15597,8 @@
         </ha-card>
       `;
       }
-      const forecast = weather.attributes.daily_forecast.slice(0, forecastItems);
-	  const hourly_forecast = weather.attributes.hourly_forecast ? weather.attributes.hourly_forecast.slice(0, forecastItems) : "";
+      const forecast = this.forecastList('daily').slice(0, forecastItems);
+	  const hourly_forecast = this.forecastList('hourly') ? this.forecastList('hourly').slice(0, forecastItems) : "";
  
 	//console.log(hourly_forecast);
       return p`
@@ -0,0 +1,363 @@
+"""Typed view of a caiyun payload, parsed once per coordinator update."""
+from array import array
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, tzinfo
+import logging
+import math
+import time
+
+from .summary import WET
+
+_LOGGER = logging.getLogger(__name__)
+
+_HOUR = timedelta(hours=1)
+
+# skycon codes as stored in the small-int skycon columns
+SKYCONS = (
+    'CLEAR_DAY', 'CLEAR_NIGHT', 'PARTLY_CLOUDY_DAY', 'PARTLY_CLOUDY_NIGHT', 'CLOUDY',
+    'LIGHT_HAZE', 'MODERATE_HAZE', 'HEAVY_HAZE', 'LIGHT_RAIN', 'MODERATE_RAIN',
+    'HEAVY_RAIN', 'STORM_RAIN', 'FOG', 'LIGHT_SNOW', 'MODERATE_SNOW', 'HEAVY_SNOW',
+    'STORM_SNOW', 'DUST', 'SAND', 'THUNDER_SHOWER', 'HAIL', 'SLEET', 'WIND', 'HAZE',
+    'RAIN', 'SNOW',
+)
+SKYCON_CODES = {skycon: code for code, skycon in enumerate(SKYCONS)}
+# stands in for skycons newer than this table
+FALLBACK_SKYCON = SKYCON_CODES['CLOUDY']
+# unknown skycons already logged
+_unknown_skycons = set()
+
+
+@dataclass(slots=True)
+class Realtime:
+    """result.realtime, with unit conversions applied."""
+
+    skycon: str
+    temperature: float
+    apparent_temperature: float
+    humidity: float
+    pressure: int
+    visibility: float
+    cloudrate: float
+    wind_speed: float
+    wind_direction: float
+    pm25: float
+    pm10: float
+    o3: float
+    no2: float
+    so2: float
+    co: float
+    aqi: float
+    aqi_description: str
+    aqi_usa: float
+    aqi_usa_description: str
+    comfort_index: int
+    comfort_desc: str
+    ultraviolet_index: float
+    ultraviolet_desc: str
+    precipitation_intensity: float
+    precipitation_datasource: str
+    nearest_intensity: float
+    nearest_distance: float
+
+
+@dataclass(slots=True)
+class Minutely:
+    """result.minutely plus the forecast texts that come with it.
+
+    precipitation_2h is an array('d') of intensities, minute i after the payload.
+    """
+
+    description: str
+    probability: list
+    forecast_keypoint: str
+    hourly_description: str
+    precipitation_2h: array
+
+    def intensity_at(self, minute):
+        """Return the precipitation intensity minute minutes after the payload, None past the nowcast."""
+        if not 0 <= minute < len(self.precipitation_2h):
+            return None
+        return self.precipitation_2h[minute]
+
+    def minutes_until(self, wet, start=0):
+        """Return the minutes from minute start until the first wet (or dry) minute, None if there is none."""
+        for minute in range(max(start, 0), len(self.precipitation_2h)):
+            if (self.precipitation_2h[minute] > WET) == wet:
+                return minute - start
+        return None
+
+
+@dataclass(slots=True)
+class Hourly:
+    """result.hourly as columns, row i is start + i * step.
+
+    Numeric series are array('d'), skycon is an array('B') of SKYCONS codes and
+    a missing precipitation probability is nan.
+    """
+
+    start: datetime
+    step: timedelta
+    skycon: array
+    temperature: array
+    apparent_temperature: array
+    humidity: array
+    cloudrate: array
+    wind_speed: array
+    wind_direction: array
+    visibility: array
+    precipitation: array
+    probability: array
+    aqi_chn: array
+    aqi_usa: array
+    pm25: array
+
+    def __len__(self):
+        return len(self.temperature)
+
+    def datetime_at(self, i):
+        """Return the aware datetime of row i."""
+        return self.start + self.step * i
+
+    def hours(self):
+        """Return the hour of day of every row."""
+        if self.step != _HOUR:
+            return [self.datetime_at(i).hour for i in range(len(self))]
+        first = self.start.hour
+        return [(first + i) % 24 for i in range(len(self))]
+
+    def timeline(self, sep=' ', offset=False):
+        """Return 'YYYY-mm-dd<sep>HH:MM' of every row, plus the utc offset if asked.
+
+        Rows are whole hours apart in a fixed offset, so only the hour moves and
+        each date is formatted once a day instead of once a row.
+        """
+        if self.start is None:
+            return []
+        suffix = self.start.isoformat(timespec='minutes')[16:] if offset else ''
+        if self.step != _HOUR:
+            return [self.datetime_at(i).strftime(f'%Y-%m-%d{sep}%H:%M') + suffix for i in range(len(self))]
+        minute = self.start.minute
+        clock = [f'{sep}{hour:02d}:{minute:02d}{suffix}' for hour in range(24)]
+        first = self.start.hour
+        day = self.start.date()
+        labels = []
+        prefix = None
+        for i in range(len(self)):
+            hour = first + i
+            if prefix is None or hour % 24 == 0:
+                prefix = (day + timedelta(days=hour // 24)).isoformat()
+            labels.append(prefix + clock[hour % 24])
+        return labels
+
+
+@dataclass(slots=True)
+class HalfDay:
+    """One of the 08h_20h (day) or 20h_32h (night) blocks of result.daily as columns."""
+
+    skycon: array
+    temperature_max: array
+    temperature_min: array
+    precipitation: array
+    probability: array
+    wind_speed: array
+    wind_direction: array
+
+
+@dataclass(slots=True)
+class Daily:
+    """result.daily as columns, row i is the local date start + i days."""
+
+    start: date
+    tzinfo: tzinfo
+    skycon: array
+    precipitation: array
+    temperature_max: array
+    temperature_min: array
+    wind_speed: array
+    wind_direction: array
+    astro: tuple
+    day: HalfDay
+    night: HalfDay
+
+    def __len__(self):
+        return len(self.temperature_max)
+
+    def date_at(self, i):
+        """Return the date of row i."""
+        return self.start + timedelta(days=i)
+
+
+@dataclass(slots=True)
+class Alert:
+    """result.alert."""
+
+    raw: dict
+    city: str
+
+
+@dataclass(slots=True)
+class WeatherModel:
+    """Everything the entities read, built by parse_payload."""
+
+    server_time: int
+    update_time: datetime
+    realtime: Realtime
+    minutely: Minutely
+    hourly: Hourly
+    daily: Daily
+    alert: Alert
+    lifeindex: dict = field(default_factory=dict)
+
+
+def _column(series, key="value"):
+    return array('d', [item[key] for item in series])
+
+
+def _skycon_code(skycon):
+    if skycon not in _unknown_skycons:
+        _unknown_skycons.add(skycon)
+        _LOGGER.warning("Unknown skycon %s, shown as CLOUDY", skycon)
+    return FALLBACK_SKYCON
+
+
+def _skycons(series):
+    codes = SKYCON_CODES
+    return array('B', [
+        codes[item["value"]] if item["value"] in codes else _skycon_code(item["value"])
+        for item in series
+    ])
+
+
+def _parse_realtime(realtime):
+    air_quality = realtime["air_quality"]
+    life_index = realtime["life_index"]
+    precipitation = realtime["precipitation"]
+    local = precipitation["local"]
+    # without a nearest block the local reading stands in, as the sensor always did
+    nearest = precipitation.get("nearest")
+    return Realtime(
+        skycon=realtime["skycon"] if realtime["skycon"] in SKYCON_CODES else SKYCONS[_skycon_code(realtime["skycon"])],
+        temperature=realtime["temperature"],
+        apparent_temperature=realtime["apparent_temperature"],
+        humidity=float(realtime["humidity"]) * 100,
+        pressure=round(float(realtime["pressure"]) / 100),
+        visibility=realtime["visibility"],
+        cloudrate=realtime["cloudrate"],
+        wind_speed=realtime["wind"]["speed"],
+        wind_direction=realtime["wind"]["direction"],
+        pm25=air_quality["pm25"],
+        pm10=air_quality["pm10"],
+        o3=air_quality["o3"],
+        no2=air_quality["no2"],
+        so2=air_quality["so2"],
+        co=air_quality["co"],
+        aqi=air_quality["aqi"]["chn"],
+        aqi_description=air_quality["description"]["chn"],
+        aqi_usa=air_quality["aqi"]["usa"],
+        aqi_usa_description=air_quality["description"]["usa"],
+        comfort_index=life_index["comfort"]["index"],
+        comfort_desc=life_index["comfort"]["desc"],
+        ultraviolet_index=life_index["ultraviolet"]["index"],
+        ultraviolet_desc=life_index["ultraviolet"]["desc"],
+        precipitation_intensity=local["intensity"],
+        precipitation_datasource=local["datasource"],
+        nearest_intensity=nearest["intensity"] if nearest else local["intensity"],
+        nearest_distance=nearest["distance"] if nearest else local["datasource"],
+    )
+
+
+def _parse_hourly(hourly):
+    precipitation = hourly["precipitation"]
+    aqi = hourly["air_quality"]["aqi"]
+    wind = hourly["wind"]
+    # caiyun returns contiguous hours, only the first timestamp is parsed
+    start = datetime.fromisoformat(precipitation[0]["datetime"].replace('Z', '+00:00')) if precipitation else None
+    return Hourly(
+        start=start,
+        step=timedelta(hours=1),
+        skycon=_skycons(hourly["skycon"]),
+        temperature=_column(hourly["temperature"]),
+        apparent_temperature=_column(hourly["apparent_temperature"]),
+        humidity=_column(hourly["humidity"]),
+        cloudrate=_column(hourly["cloudrate"]),
+        wind_speed=_column(wind, "speed"),
+        wind_direction=_column(wind, "direction"),
+        visibility=_column(hourly["visibility"]),
+        precipitation=_column(precipitation),
+        probability=_probabilities(precipitation),
+        aqi_chn=array('d', [item["value"]["chn"] for item in aqi]),
+        aqi_usa=array('d', [item["value"]["usa"] for item in aqi]),
+        pm25=_column(hourly["air_quality"]["pm25"]),
+    )
+
+
+def _probabilities(series):
+    return array('d', [
+        math.nan if item.get("probability") is None else item["probability"]
+        for item in series
+    ])
+
+
+def _parse_half_day(daily, block):
+    # older payloads lack the half day skycons, the whole day one stands in
+    skycon = daily.get(f"skycon_{block}") or daily["skycon"]
+    temperature = daily[f"temperature_{block}"]
+    precipitation = daily[f"precipitation_{block}"]
+    wind = daily[f"wind_{block}"]
+    return HalfDay(
+        skycon=_skycons(skycon),
+        temperature_max=_column(temperature, "max"),
+        temperature_min=_column(temperature, "min"),
+        precipitation=_column(precipitation, "avg"),
+        probability=_probabilities(precipitation),
+        wind_speed=array('d', [item["avg"]["speed"] for item in wind]),
+        wind_direction=array('d', [item["avg"]["direction"] for item in wind]),
+    )
+
+
+def _parse_daily(daily):
+    temperature = daily["temperature"]
+    first = datetime.fromisoformat(temperature[0]["date"].replace('Z', '+00:00')) if temperature else None
+    return Daily(
+        start=first.date() if first else None,
+        tzinfo=first.tzinfo if first else None,
+        skycon=_skycons(daily["skycon"]),
+        precipitation=_column(daily["precipitation"], "avg"),
+        temperature_max=_column(temperature, "max"),
+        temperature_min=_column(temperature, "min"),
+        wind_speed=array('d', [item["avg"]["speed"] for item in daily["wind"]]),
+        wind_direction=array('d', [item["avg"]["direction"] for item in daily["wind"]]),
+        astro=tuple(daily["astro"]),
+        day=_parse_half_day(daily, "08h_20h"),
+        night=_parse_half_day(daily, "20h_32h"),
+    )
+
+
+def _parse_alert(alert):
+    if alert is None:
+        return Alert(raw="", city="")
+    adcodes = alert.get("adcodes") or [{}]
+    return Alert(raw=alert, city=adcodes[-1].get("name", ""))
+
+
+def parse_payload(server_time, result, lifeindex):
+    """Build the WeatherModel of one payload."""
+    start = time.perf_counter()
+    model = WeatherModel(
+        server_time=server_time,
+        update_time=datetime.fromtimestamp(server_time),
+        realtime=_parse_realtime(result["realtime"]),
+        minutely=Minutely(
+            description=result["minutely"]["description"],
+            probability=result["minutely"]["probability"],
+            forecast_keypoint=result["forecast_keypoint"],
+            hourly_description=result["hourly"]["description"],
+            precipitation_2h=array('d', result["minutely"].get("precipitation_2h") or ()),
+        ),
+        hourly=_parse_hourly(result["hourly"]),
+        daily=_parse_daily(result["daily"]),
+        alert=_parse_alert(result.get("alert")),
+        lifeindex=lifeindex,
+    )
+    _LOGGER.debug("Parsed payload in %.1f ms", (time.perf_counter() - start) * 1000)
+    return model
@@ -0,0 +1,67 @@
+"""Poll scheduling helpers for colorfulclouds-weather."""
+import asyncio
+import hashlib
+import math
+import time
+
+from .const import DOMAIN, FETCH_SLOTS, MAX_CONCURRENT_FETCHES
+
+
+def precipitation_urgency(model):
+    """Return 0..1, how soon the weather is likely to change at this location."""
+    realtime = model.realtime
+    if realtime.precipitation_intensity > 0:
+        return 1.0
+
+    urgency = 0.0
+    probability = model.minutely.probability or []
+    if probability:
+        # first two entries cover the next hour
+        urgency = min(1.0, max(probability[:2]) * 2)
+
+    # without a nearest block the model carries the datasource name instead
+    distance = realtime.nearest_distance
+    if isinstance(distance, (int, float)):
+        if distance < 10:
+            urgency = max(urgency, 0.8)
+        elif distance < 50:
+            urgency = max(urgency, 0.5)
+
+    if model.alert.raw and model.alert.raw.get("content"):
+        urgency = max(urgency, 0.5)
+    return urgency
+
+
+def adaptive_interval(model, floor, ceiling):
+    """Return the next poll interval in minutes, between floor and ceiling."""
+    if ceiling <= floor:
+        return floor
+    return round(ceiling - (ceiling - floor) * precipitation_urgency(model))
+
+
+def phase_offset(key):
+    """Return a stable 0..1 phase for key, so pollers spread over their interval."""
+    digest = hashlib.sha1(str(key).encode()).hexdigest()
+    return int(digest[:8], 16) / 0xFFFFFFFF
+
+
+def seconds_to_slot(minutes, phase, now=None):
+    """Return the delay until the next poll slot of a poller with this phase.
+
+    Slots repeat every minutes, shifted by phase of the interval, so pollers
+    sharing an interval never fire together. A slot closer than half an
+    interval is skipped to keep the spacing between polls sane.
+    """
+    period = minutes * 60
+    if now is None:
+        now = time.time()
+    offset = phase * period
+    delay = (math.floor((now - offset) / period) + 1) * period + offset - now
+    if delay < period / 2:
+        delay += period
+    return delay
+
+
+def fetch_slots(hass):
+    """Return the domain wide semaphore bounding simultaneous fetches."""
+    return hass.data[DOMAIN].setdefault(FETCH_SLOTS, asyncio.Semaphore(MAX_CONCURRENT_FETCHES))
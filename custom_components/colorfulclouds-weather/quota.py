@@ -0,0 +1,73 @@
+"""Daily request accounting for a caiyun api key."""
+import hashlib
+import logging
+from datetime import timedelta
+
+import homeassistant.util.dt as dt_util
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+# seconds, batches count writes
+QUOTA_SAVE_DELAY = 60
+
+
+class QuotaManager:
+    """Count requests per endpoint for one api key and spread the daily budget."""
+
+    def __init__(self, hass, api_key, daily_quota):
+        """Initialize."""
+        self.daily_quota = daily_quota
+        # the api key itself never ends up in .storage
+        key_id = hashlib.sha1(str(api_key).encode()).hexdigest()[:12]
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.quota.{key_id}")
+        self._date = dt_util.now().date().isoformat()
+        self._counts = {}
+
+    async def async_load(self):
+        """Restore today's counts after a restart."""
+        data = await self._store.async_load()
+        if data and data.get("date") == self._date:
+            self._counts = data.get("counts", {})
+
+    def _data(self):
+        return {"date": self._date, "counts": self._counts}
+
+    def _roll_day(self):
+        today = dt_util.now().date().isoformat()
+        if today != self._date:
+            self._date = today
+            self._counts = {}
+
+    @property
+    def used(self):
+        """Requests made today."""
+        self._roll_day()
+        return sum(self._counts.values())
+
+    @property
+    def remaining(self):
+        """Requests left in today's budget."""
+        return max(self.daily_quota - self.used, 0)
+
+    @property
+    def counts(self):
+        """Requests made today, per endpoint."""
+        self._roll_day()
+        return dict(self._counts)
+
+    def async_record(self, endpoint):
+        """Count one request to endpoint."""
+        self._roll_day()
+        self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+        self._store.async_delay_save(self._data, QUOTA_SAVE_DELAY)
+
+    def stretch_factor(self, calls_per_minute, shares):
+        """Return how much a poller must slow down to fit its share of what is left today."""
+        now = dt_util.now()
+        midnight = dt_util.start_of_local_day(now) + timedelta(days=1)
+        minutes_left = (midnight - now).total_seconds() / 60
+        budget = max(self.remaining / max(shares, 1), 1)
+        return max(1.0, calls_per_minute * minutes_left / budget)
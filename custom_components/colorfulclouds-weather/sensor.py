@@ -7,23 +7,38 @@ from homeassistant.const import (
     CONF_NAME,
     DEVICE_CLASS_TEMPERATURE,
 )
+import math
 import time
+from datetime import datetime
+from operator import attrgetter
 
-from datetime import datetime, timedelta
-
-from homeassistant.helpers.entity import Entity
+from homeassistant.core import callback
+from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.helpers.entity import Entity, EntityCategory
 
 from .const import (
     ATTR_ICON,
     ATTR_LABEL,
+    ATTR_OFFSETS,
     ATTRIBUTION,
+    CONF_HEARTBEAT_INTERVAL,
     COORDINATOR,
+    DAY_LABELS,
+    DEFAULT_HEARTBEAT_INTERVAL,
     DOMAIN,
+    FORECAST_DAYS,
+    FORECAST_SENSOR_TYPES,
     MANUFACTURER,
     NAME,
+    NOWCAST_MINUTES,
+    NOWCAST_SENSOR_TYPES,
     OPTIONAL_SENSORS,
     SENSOR_TYPES,
 )
+from .forecast import CONDITION_MAP
+from .model import SKYCONS
+from .wind import beaufort, wind_direction
+from .writes import WriteFilter, suppressed_writes
 
 PARALLEL_UPDATES = 1
 _LOGGER = logging.getLogger(__name__)
@@ -32,197 +47,345 @@ _LOGGER = logging.getLogger(__name__)
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Add colorfulclouds-weather entities from a config_entry."""
     name = config_entry.data[CONF_NAME]
+    location_key = config_entry.unique_id
 
     coordinator = hass.data[DOMAIN][config_entry.entry_id][COORDINATOR]
+    heartbeat = config_entry.options.get(CONF_HEARTBEAT_INTERVAL, DEFAULT_HEARTBEAT_INTERVAL)
 
     sensors = []
     for sensor in SENSOR_TYPES:
-        sensors.append(colorfulclouds_weatherSensor(name, sensor, coordinator))
-
-    # if coordinator.forecast:
-    #     for sensor in FORECAST_SENSOR_TYPES:
-    #         for day in FORECAST_DAYS:
-    #             # Some air quality/allergy sensors are only available for certain
-    #             # locations.
-    #             if sensor in coordinator.data[ATTR_FORECAST][0]:
-    #                 sensors.append(
-    #                     colorfulclouds_weatherSensor(name, sensor, coordinator, forecast_day=day)
-    #                 )
+        sensors.append(colorfulclouds_weatherSensor(name, sensor, coordinator, location_key, heartbeat))
+
+    for kind, description in FORECAST_SENSOR_TYPES.items():
+        for offset in description[ATTR_OFFSETS]:
+            sensors.append(colorfulclouds_weatherForecastSensor(name, kind, offset, coordinator, location_key, heartbeat))
+    for kind, description in NOWCAST_SENSOR_TYPES.items():
+        for offset in description[ATTR_OFFSETS]:
+            sensors.append(colorfulclouds_weatherNowcastSensor(name, kind, offset, coordinator, location_key, heartbeat))
+
+    sensors.append(colorfulclouds_weatherQuotaSensor(name, coordinator, location_key, heartbeat))
 
     async_add_entities(sensors, False)
 
 
+def _device_info(name, location_key):
+    """Device every entity of one entry belongs to."""
+    return {
+        "identifiers": {(DOMAIN, location_key)},
+        "name": name,
+        "manufacturer": MANUFACTURER,
+        "entry_type": DeviceEntryType.SERVICE,
+    }
+
+
+def _wind_speed_attributes(realtime):
+    level = beaufort(realtime.wind_speed)
+    return {"level": level.level, "label": level.label, "desc": level.description}
+
+
+# kind -> state of the sensor, read from a WeatherModel
+STATE_ACCESSORS = {
+    "apparent_temperature": attrgetter("realtime.apparent_temperature"),
+    "pressure": attrgetter("realtime.pressure"),
+    "temperature": attrgetter("realtime.temperature"),
+    "humidity": lambda model: round(model.realtime.humidity),
+    "cloudrate": attrgetter("realtime.cloudrate"),
+    "visibility": attrgetter("realtime.visibility"),
+    "WindSpeed": attrgetter("realtime.wind_speed"),
+    "WindDirection": attrgetter("realtime.wind_direction"),
+    "pm25": attrgetter("realtime.pm25"),
+    "comfort": attrgetter("realtime.comfort_index"),
+    "ultraviolet": attrgetter("realtime.ultraviolet_index"),
+    "precipitation": attrgetter("realtime.precipitation_intensity"),
+    "update_time": attrgetter("update_time"),
+}
+
+# kind -> extra attributes of the sensor, read from the realtime block
+ATTRIBUTE_ACCESSORS = {
+    "ultraviolet": lambda realtime: {"desc": realtime.ultraviolet_desc},
+    "comfort": lambda realtime: {"desc": realtime.comfort_desc},
+    "precipitation": lambda realtime: {
+        "datasource": realtime.precipitation_datasource,
+        "nearest_intensity": realtime.nearest_intensity,
+        "nearest_distance": realtime.nearest_distance,
+    },
+    "WindSpeed": _wind_speed_attributes,
+    "WindDirection": lambda realtime: {"direction": wind_direction(realtime.wind_direction)},
+}
+
+
 class colorfulclouds_weatherSensor(Entity):
-    """Define an colorfulclouds-weather entity."""
+    """Define an colorfulclouds-weather entity.
+
+    State, attributes and availability are computed once per coordinator
+    update and only written when one of them changed or the heartbeat is due.
+    """
 
-    def __init__(self, name, kind, coordinator, forecast_day=None):
+    _attr_should_poll = False
+    _attr_entity_registry_enabled_default = True
+    _descriptions = SENSOR_TYPES
+    _accessors = STATE_ACCESSORS
+
+    def __init__(self, name, kind, coordinator, location_key, heartbeat=DEFAULT_HEARTBEAT_INTERVAL):
         """Initialize."""
         self._name = name
+        self._heartbeat = heartbeat
+        self._write_filter = None
         self.kind = kind
         self.coordinator = coordinator
-        self._device_class = None
-        self._attrs = {ATTR_ATTRIBUTION: ATTRIBUTION}
+        self.location_key = location_key
         self._unit_system = "Metric" if self.coordinator.data["is_metric"]=="metric:v2" else "Imperial"
-        self.forecast_day = forecast_day
+        description = self._descriptions[kind]
+        self._attr_name = f"{name} {description[ATTR_LABEL]}"
+        self._attr_unique_id = f"{location_key}-{kind}".lower()
+        self._attr_icon = description[ATTR_ICON]
+        self._attr_device_class = description[ATTR_DEVICE_CLASS]
+        self._attr_unit_of_measurement = description[self._unit_system]
+        if kind in OPTIONAL_SENSORS:
+            self._attr_entity_registry_enabled_default = False
+        self._attr_device_info = _device_info(name, location_key)
+        self._state_accessor = self._accessors[kind]
+        self._attributes_accessor = ATTRIBUTE_ACCESSORS.get(kind)
+        self._update_from_coordinator()
+
+    def _update_from_coordinator(self):
+        """Recompute the _attr_ values, return their fingerprint."""
+        model = self.coordinator.model
+        self._attr_state = self._state_accessor(model)
+        attributes = {ATTR_ATTRIBUTION: ATTRIBUTION}
+        if self._attributes_accessor is not None:
+            attributes.update(self._attributes_accessor(model.realtime))
+        self._attr_extra_state_attributes = attributes
+        self._attr_available = not self.coordinator.stale
+        return (self._attr_state, tuple(attributes.items()), self._attr_available)
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the state when the new payload changed it."""
+        if self._write_filter.should_write(self._update_from_coordinator()):
+            self.async_write_ha_state()
+
+    async def async_added_to_hass(self):
+        """Connect to dispatcher listening for entity data notifications."""
+        self._write_filter = WriteFilter(self.hass, self._heartbeat)
+        self._write_filter.should_write(self._update_from_coordinator())
+        self.async_on_remove(
+            self.coordinator.async_add_listener(self._handle_coordinator_update)
+        )
+
+    async def async_update(self):
+        """Update colorfulclouds-weather entity."""
+        await self.coordinator.async_request_refresh()
+
+
+def _hour_index(hourly, offset):
+    """Row of the hourly forecast offset hours from now."""
+    if hourly.start is None:
+        return None
+    now = datetime.now(hourly.start.tzinfo)
+    return int((now - hourly.start).total_seconds() // hourly.step.total_seconds()) + offset
+
+
+def _day_index(daily, offset):
+    """Row of the daily forecast offset days from today."""
+    if daily.start is None:
+        return None
+    return (datetime.now(daily.tzinfo).date() - daily.start).days + offset
+
+
+def _value_at(series, i):
+    """series[i], None when i is outside the series or the value is missing."""
+    if i is None or not 0 <= i < len(series):
+        return None
+    value = series[i]
+    return None if math.isnan(value) else value
+
+
+def _hourly_value(name):
+    def accessor(coordinator, offset):
+        hourly = coordinator.model.hourly
+        return _value_at(getattr(hourly, name), _hour_index(hourly, offset))
+    return accessor
+
+
+def _daily_value(name):
+    def accessor(coordinator, offset):
+        daily = coordinator.model.daily
+        return _value_at(getattr(daily, name), _day_index(daily, offset))
+    return accessor
+
+
+def _precipitation_sum(coordinator, hours):
+    hourly = coordinator.model.hourly
+    start = _hour_index(hourly, 0)
+    if start is None or not 0 <= start < len(hourly):
+        return None
+    return coordinator.forecasts.precipitation.total(start, hours)
+
+
+def _daily_condition(coordinator, offset):
+    daily = coordinator.model.daily
+    i = _day_index(daily, offset)
+    if i is None or not 0 <= i < len(daily):
+        return None
+    return CONDITION_MAP[SKYCONS[daily.skycon[i]]]
+
+
+# kind -> state of the forecast sensor, read from the coordinator at an offset
+FORECAST_ACCESSORS = {
+    "hourly_temperature": _hourly_value("temperature"),
+    "hourly_precipitation": _hourly_value("precipitation"),
+    "hourly_probability": _hourly_value("probability"),
+    "precipitation_sum": _precipitation_sum,
+    "daily_temperature_max": _daily_value("temperature_max"),
+    "daily_temperature_min": _daily_value("temperature_min"),
+    "daily_precipitation": _daily_value("precipitation"),
+    "daily_condition": _daily_condition,
+}
+
+
+def _elapsed_minutes(model):
+    """Minutes since the payload, the nowcast rows are counted from it."""
+    return max(int((time.time() - model.server_time) // 60), 0)
+
+
+def _nowcast_intensity(coordinator, offset):
+    model = coordinator.model
+    return model.minutely.intensity_at(_elapsed_minutes(model) + offset)
+
+
+def _nowcast_until(wet):
+    def accessor(coordinator, offset):
+        model = coordinator.model
+        return model.minutely.minutes_until(wet, _elapsed_minutes(model) + offset)
+    return accessor
+
+
+# kind -> state of the nowcast sensor, minutes ahead of now
+NOWCAST_ACCESSORS = {
+    "minutely_precipitation": _nowcast_intensity,
+    "minutely_rain_starts": _nowcast_until(True),
+    "minutely_rain_stops": _nowcast_until(False),
+}
+
+
+def _offset_label(description, offset):
+    if description[ATTR_OFFSETS] is NOWCAST_MINUTES and offset == 0:
+        return "当前降水强度"
+    if description[ATTR_OFFSETS] is not FORECAST_DAYS:
+        return description[ATTR_LABEL].format(offset)
+    day = DAY_LABELS[offset] if offset < len(DAY_LABELS) else f"{offset}天后"
+    return description[ATTR_LABEL].format(day)
+
+
+class colorfulclouds_weatherForecastSensor(colorfulclouds_weatherSensor):
+    """One value of the hourly or daily forecast, offset hours or days ahead.
+
+    The state is a single lookup into the parsed columns, so every update
+    costs the same whatever the forecast length. Disabled by default.
+    """
+
+    _attr_entity_registry_enabled_default = False
+    _descriptions = FORECAST_SENSOR_TYPES
+    _accessors = FORECAST_ACCESSORS
+
+    def __init__(self, name, kind, offset, coordinator, location_key, heartbeat=DEFAULT_HEARTBEAT_INTERVAL):
+        """Initialize."""
+        self.offset = offset
+        super().__init__(name, kind, coordinator, location_key, heartbeat)
+        self._attr_name = f"{name} {_offset_label(self._descriptions[kind], offset)}"
+        self._attr_unique_id = f"{location_key}-{kind}_{offset}".lower()
+
+    def _update_from_coordinator(self):
+        """Recompute the _attr_ values, return their fingerprint."""
+        self._attr_state = self._state_accessor(self.coordinator, self.offset)
+        self._attr_extra_state_attributes = {ATTR_ATTRIBUTION: ATTRIBUTION}
+        self._attr_available = not self.coordinator.stale
+        return (self._attr_state, self._attr_available)
+
+
+class colorfulclouds_weatherNowcastSensor(colorfulclouds_weatherForecastSensor):
+    """Minutely precipitation nowcast for rain triggered automations.
+
+    Intensity offset minutes ahead, or the minutes until the rain starts or
+    stops (0 when it already does, None when not within the two hours).
+    """
+
+    _attr_entity_registry_enabled_default = True
+    _descriptions = NOWCAST_SENSOR_TYPES
+    _accessors = NOWCAST_ACCESSORS
+
+
+class colorfulclouds_weatherQuotaSensor(Entity):
+    """Remaining daily requests of the api key used by this entry.
+
+    Written once per coordinator update, after the requests of that update
+    were counted, instead of on every request of every entry sharing the key.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_icon = "mdi:counter"
+    _attr_should_poll = False
+
+    def __init__(self, name, coordinator, location_key, heartbeat=DEFAULT_HEARTBEAT_INTERVAL):
+        """Initialize."""
+        self._name = name
+        self._heartbeat = heartbeat
+        self._write_filter = None
+        self.coordinator = coordinator
+        self.location_key = location_key
+        self.quota = coordinator.client.quota
 
     @property
     def name(self):
         """Return the name."""
-        if self.forecast_day is not None:
-            return f"{self._name} {FORECAST_SENSOR_TYPES[self.kind][ATTR_LABEL]} {self.forecast_day}d"
-        return f"{self._name} {SENSOR_TYPES[self.kind][ATTR_LABEL]}"
+        return f"{self._name} API剩余次数"
 
     @property
     def unique_id(self):
         """Return a unique_id for this entity."""
-        # if self.forecast_day is not None:
-        #     return f"{self.coordinator.location_key}-{self.kind}-{self.forecast_day}".lower()
-        _LOGGER.info("sensor_unique_id: %s-%s", self.coordinator.data["location_key"], self.kind)
-        return f"{self.coordinator.data['location_key']}-{self.kind}".lower()
+        return f"{self.location_key}-quota_remaining".lower()
 
     @property
     def device_info(self):
         """Return the device info."""
-        info = {
-            "identifiers": {(DOMAIN, self.coordinator.data["location_key"])},
-            "name": self._name,
-            "manufacturer": MANUFACTURER,
-        }
-        # LEGACY can be removed when min HA version is 2021.12
-        info = {
-            "identifiers": {(DOMAIN, self.coordinator.data["location_key"])},
-            "name": self._name,
-            "manufacturer": MANUFACTURER,
-        }        
-        from homeassistant.helpers.device_registry import DeviceEntryType
-        info["entry_type"] = DeviceEntryType.SERVICE        
-        return info
-
-    @property
-    def should_poll(self):
-        """Return the polling requirement of the entity."""
-        return False
-
-    @property
-    def available(self):
-        """Return True if entity is available."""
-        #return self.coordinator.last_update_success
-        return (int(datetime.now().timestamp()) - int(self.coordinator.data["server_time"]) < 1800)
+        return _device_info(self._name, self.location_key)
 
     @property
     def state(self):
         """Return the state."""
-        # if self.forecast_day is not None:
-        #     if (
-        #         FORECAST_SENSOR_TYPES[self.kind][ATTR_DEVICE_CLASS]
-        #         == DEVICE_CLASS_TEMPERATURE
-        #     ):
-        #         return self.coordinator.data["result"][ATTR_FORECAST][self.forecast_day][
-        #             self.kind
-        #         ]["Value"]
-        #     if self.kind in ["WindGustDay", "WindGustNight"]:
-        #         return self.coordinator.data["result"][ATTR_FORECAST][self.forecast_day][
-        #             self.kind
-        #         ]["Speed"]["Value"]
-        #     if self.kind in ["Grass", "Mold", "Ragweed", "Tree", "UVIndex", "Ozone"]:
-        #         return self.coordinator.data["result"][ATTR_FORECAST][self.forecast_day][
-        #             self.kind
-        #         ]["Value"]
-        #     return self.coordinator.data["result"][ATTR_FORECAST][self.forecast_day][self.kind]
-        if self.kind == "apparent_temperature":
-            return self.coordinator.data["result"]["realtime"][self.kind]
-        if self.kind == "pressure":
-            return round(float(self.coordinator.data["result"]["realtime"][self.kind])/100)
-        if self.kind == "temperature":
-            return self.coordinator.data["result"]["realtime"][self.kind]
-        if self.kind == "humidity":
-            return round(float(self.coordinator.data["result"]["realtime"][self.kind])*100)
-        if self.kind == "cloudrate":
-            return self.coordinator.data["result"]["realtime"][self.kind]
-        if self.kind == "visibility":
-            return self.coordinator.data["result"]["realtime"][self.kind]
-        if self.kind == "WindSpeed":
-            return self.coordinator.data["result"]["realtime"]["wind"]["speed"]
-        if self.kind == "WindDirection":
-            return self.coordinator.data["result"]["realtime"]["wind"]["direction"]
-        if self.kind == "pm25":
-            return self.coordinator.data["result"]["realtime"]["air_quality"]["pm25"] 
-        if self.kind == "comfort":
-            return self.coordinator.data["result"]["realtime"]["life_index"]["comfort"]["index"]
-        if self.kind == "ultraviolet":
-            return self.coordinator.data["result"]["realtime"]["life_index"]["ultraviolet"]["index"]
-        if self.kind == "precipitation":
-            return self.coordinator.data["result"]["realtime"]["precipitation"]["local"]["intensity"]
-        if self.kind == "update_time":
-            return datetime.fromtimestamp(self.coordinator.data["server_time"]) 
-
-    @property
-    def icon(self):
-        """Return the icon."""
-        # if self.forecast_day is not None:
-        #     return FORECAST_SENSOR_TYPES[self.kind][ATTR_ICON]
-        return SENSOR_TYPES[self.kind][ATTR_ICON]
-
-    @property
-    def device_class(self):
-        """Return the device_class."""
-        # if self.forecast_day is not None:
-        #     return FORECAST_SENSOR_TYPES[self.kind][ATTR_DEVICE_CLASS]
-        return SENSOR_TYPES[self.kind][ATTR_DEVICE_CLASS]
-
-    @property
-    def unit_of_measurement(self):
-        """Return the unit the value is expressed in."""
-        # if self.forecast_day is not None:
-        #     return FORECAST_SENSOR_TYPES[self.kind][self._unit_system]
-        return SENSOR_TYPES[self.kind][self._unit_system]
+        return self.quota.remaining
 
     @property
     def extra_state_attributes(self):
         """Return the state attributes."""
-        # if self.forecast_day is not None:
-        #     if self.kind in ["WindGustDay", "WindGustNight"]:
-        #         self._attrs["direction"] = self.coordinator.data.data[ATTR_FORECAST][
-        #             self.forecast_day
-        #         ][self.kind]["Direction"]["English"]
-        #     elif self.kind in ["Grass", "Mold", "Ragweed", "Tree", "UVIndex", "Ozone"]:
-        #         self._attrs["level"] = self.coordinator.data.data[ATTR_FORECAST][
-        #             self.forecast_day
-        #         ][self.kind]["Category"]
-        #     return self._attrs
-        if self.kind == "ultraviolet":
-            self._attrs["desc"] = self.coordinator.data["result"]["realtime"]["life_index"]["ultraviolet"]["desc"]
-        elif self.kind == "comfort":
-            self._attrs["desc"] = self.coordinator.data["result"]["realtime"]["life_index"]["comfort"]["desc"]
-        elif self.kind == "precipitation":
-        #原来的    
-            #self._attrs["datasource"] = self.coordinator.data["result"]["realtime"]["precipitation"]["local"]["datasource"]
-            #self._attrs["nearest_intensity"] = self.coordinator.data["result"]["realtime"]["precipitation"]["nearest"]["intensity"]
-            #self._attrs["nearest_distance"] = self.coordinator.data["result"]["realtime"]["precipitation"]["nearest"]["distance"]
-        #return self._attrs
-        #原来的 
-            self._attrs["datasource"] = self.coordinator.data["result"]["realtime"]["precipitation"]["local"]["datasource"]
-            #self._attrs["nearest_intensity"] = self.coordinator.data["result"]["realtime"]["precipitation"]["nearest"]["intensity"]
-            #self._attrs["nearest_distance"] = self.coordinator.data["result"]["realtime"]["precipitation"]["nearest"]["distance"]
-            if "nearest" in str(self.coordinator.data["result"]["realtime"]["precipitation"]):
-                self._attrs["nearest_intensity"] = self.coordinator.data["result"]["realtime"]["precipitation"]["nearest"]["intensity"]
-                self._attrs["nearest_distance"] = self.coordinator.data["result"]["realtime"]["precipitation"]["nearest"]["distance"]
-            else:
-                self._attrs["nearest_intensity"] = self.coordinator.data["result"]["realtime"]["precipitation"]["local"]["intensity"]
-                self._attrs["nearest_distance"] = self.coordinator.data["result"]["realtime"]["precipitation"]["local"]["datasource"]
-        return self._attrs
+        return {
+            ATTR_ATTRIBUTION: ATTRIBUTION,
+            "daily_quota": self.quota.daily_quota,
+            "used": self.quota.used,
+            "requests": self.quota.counts,
+            "shared_entries": self.coordinator.client.shares,
+            "update_interval": self.coordinator.poll_interval,
+            "suppressed_writes": suppressed_writes(self.hass),
+        }
 
-    @property
-    def entity_registry_enabled_default(self):
-        """Return if the entity should be enabled when first added to the entity registry."""
-        return bool(self.kind not in OPTIONAL_SENSORS)
+    def _fingerprint(self):
+        # the suppressed count moves with every other entity, it rides along with real changes
+        attributes = {
+            key: value for key, value in self.extra_state_attributes.items() if key != "suppressed_writes"
+        }
+        return (self.state, attributes)
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the counts when the update changed them."""
+        if self._write_filter.should_write(self._fingerprint()):
+            self.async_write_ha_state()
 
     async def async_added_to_hass(self):
-        """Connect to dispatcher listening for entity data notifications."""
+        """Follow the coordinator, the requests of each update are counted by then."""
+        self._write_filter = WriteFilter(self.hass, self._heartbeat)
+        self._write_filter.should_write(self._fingerprint())
         self.async_on_remove(
-            self.coordinator.async_add_listener(self.async_write_ha_state)
+            self.coordinator.async_add_listener(self._handle_coordinator_update)
         )
-
-    async def async_update(self):
-        """Update colorfulclouds-weather entity."""
-        await self.coordinator.async_request_refresh()
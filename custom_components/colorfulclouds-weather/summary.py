@@ -0,0 +1,123 @@
+"""Precipitation onset, peak and end over a window of the hourly forecast."""
+from typing import NamedTuple
+
+# mm/h, an hour above this counts as wet
+WET = 0.1
+NO_PRECIPITATION = "未来24小时内无降水"
+
+
+class PrecipitationEvents(NamedTuple):
+    """Absolute row indices of a window's onset, peak and end, None when absent."""
+
+    onset: int | None
+    peak: int | None
+    end: int | None
+
+
+class PrecipitationSummary:
+    """Answer summary queries for any window of one hourly precipitation series.
+
+    Built once per payload in a single backwards pass: next_wet[i] and
+    next_dry[i] point at the first wet and first dry hour at or after i,
+    remaining[i] sums the rest of the series, and a sparse table answers
+    first-occurrence argmax over any range. Sliding the window forward or
+    changing its horizon is then a handful of lookups.
+    """
+
+    def __init__(self, precipitation, hours, conditions):
+        """Initialize from the precipitation column, hour of day and chinese condition of every row."""
+        self.precipitation = precipitation
+        self.hours = hours
+        self.conditions = conditions
+        size = len(precipitation)
+        self._size = size
+        next_wet = [size] * (size + 1)
+        next_dry = [size] * (size + 1)
+        remaining = [0.0] * (size + 1)
+        for i in range(size - 1, -1, -1):
+            value = precipitation[i]
+            next_wet[i] = i if value > WET else next_wet[i + 1]
+            next_dry[i] = i if value == 0 else next_dry[i + 1]
+            remaining[i] = remaining[i + 1] + value
+        self._next_wet = next_wet
+        self._next_dry = next_dry
+        # remaining[i] is the precipitation of rows i.. to the end
+        self._remaining = remaining
+        self._argmax = [list(range(size))]
+        width = 1
+        while width * 2 <= size:
+            prev = self._argmax[-1]
+            row = []
+            for i in range(size - width * 2 + 1):
+                left, right = prev[i], prev[i + width]
+                row.append(left if precipitation[left] >= precipitation[right] else right)
+            self._argmax.append(row)
+            width *= 2
+
+    def __len__(self):
+        return self._size
+
+    def total(self, start, hours):
+        """Return the precipitation summed over the hours rows from row start."""
+        start = min(max(start, 0), self._size)
+        stop = min(start + hours, self._size)
+        return round(self._remaining[start] - self._remaining[stop], 2)
+
+    def _peak_in(self, first, last):
+        """First index of the largest value in rows first..last inclusive."""
+        level = (last - first + 1).bit_length() - 1
+        row = self._argmax[level]
+        left, right = row[first], row[last - (1 << level) + 1]
+        return left if self.precipitation[left] >= self.precipitation[right] else right
+
+    def events(self, start=0, horizon=None):
+        """Return the PrecipitationEvents of the horizon hours from row start.
+
+        Follows the long standing summary rules: onset is the first wet hour
+        after start, peak a later hour wetter than the onset (or start itself
+        when it is already wet and nothing later is wetter) and end the first
+        dry hour after the first wet one, dropped when the peak comes later.
+        """
+        stop = self._size if horizon is None else min(self._size, start + horizon)
+        if start >= stop:
+            return PrecipitationEvents(None, None, None)
+        precipitation = self.precipitation
+        onset = self._next_wet[start + 1] if start + 1 < stop else stop
+        if onset >= stop:
+            return PrecipitationEvents(None, None, None)
+        peak = start if precipitation[start] > WET else None
+        if onset + 1 < stop:
+            later = self._peak_in(onset + 1, stop - 1)
+            if precipitation[later] > precipitation[onset]:
+                peak = later
+        first_wet = self._next_wet[start]
+        end = self._next_dry[first_wet + 1]
+        if end >= stop or (peak is not None and peak > end):
+            end = None
+        return PrecipitationEvents(onset, peak, end)
+
+    def text(self, start=0, horizon=None, now_hour=0):
+        """Return the chinese summary of the horizon hours from row start, cut to the rows there are."""
+        if not self._size:
+            return ""
+        onset, peak, end = self.events(start, horizon)
+        if onset is None:
+            if horizon is None:
+                return NO_PRECIPITATION
+            # a horizon past the series only speaks for the hours there are
+            covered = max(min(horizon, self._size - start), 0)
+            return f"未来{covered}小时内无降水"
+
+        def day(i):
+            return "今天" if self.hours[i] > now_hour else "明天"
+
+        offset = onset - start
+        if offset < 4:
+            text = f"{offset}小时后转{self.conditions[onset]}。"
+        else:
+            text = f"{day(onset)}{self.hours[onset]}点后转{self.conditions[onset]}。"
+        if peak is not None:
+            text += f"{day(peak)}{self.hours[peak]}点为{self.conditions[peak]}！"
+        if end is not None:
+            text += f"{day(end)}{self.hours[end]}点后转{self.conditions[end]}。"
+        return text
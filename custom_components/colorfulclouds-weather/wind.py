@@ -0,0 +1,64 @@
+"""Beaufort scale and compass classification of caiyun wind readings."""
+from bisect import bisect_right
+from typing import NamedTuple
+
+
+class WindLevel(NamedTuple):
+    """Beaufort level of a wind speed, with its chinese label and description."""
+
+    level: str
+    label: str
+    description: str
+
+
+# km/h, a speed below BEAUFORT_BOUNDS[i] and not below the previous bound is level i
+BEAUFORT_BOUNDS = (1, 6, 12, 20, 29, 39, 50, 62, 75, 88, 103, 118, 134, 150, 167, 184, 202)
+BEAUFORT_LEVELS = (
+    WindLevel("0", "无风", "静，烟直上"),
+    WindLevel("1", "软风", "烟示风向"),
+    WindLevel("2", "轻风", "感觉有风"),
+    WindLevel("3", "微风", "旌旗展开"),
+    WindLevel("4", "和风", "吹起尘土"),
+    WindLevel("5", "清风", "小树摇摆"),
+    WindLevel("6", "强风", "电线有声"),
+    WindLevel("7", "劲风（疾风）", "步行困难"),
+    WindLevel("8", "狂风大作", "狂风大作"),
+    WindLevel("9", "狂风呼啸", "狂风呼啸"),
+    WindLevel("10", "暴风毁树", "暴风毁树"),
+    WindLevel("11", "暴风毁树", "暴风毁树"),
+    WindLevel("12", "飓风", "飓风"),
+    WindLevel("13", "台风", "台风"),
+    WindLevel("14", "强台风", "强台风"),
+    WindLevel("15", "强台风", "强台风"),
+    WindLevel("16", "超强台风", "超强台风"),
+    WindLevel("17+", "超强台风", "超强台风"),
+)
+
+# 16 sectors of 22.5 degrees, sector 0 centred on north
+WIND_DIRECTIONS = (
+    '北', '北-东北', '东北', '东-东北', '东', '东-东南', '东南', '南-东南',
+    '南', '南-西南', '西南', '西-西南', '西', '西-西北', '西北', '北-西北',
+)
+
+
+def beaufort(speed):
+    """Return the WindLevel of a wind speed in km/h."""
+    return BEAUFORT_LEVELS[bisect_right(BEAUFORT_BOUNDS, speed)]
+
+
+def beaufort_series(speeds):
+    """Return the WindLevel of every speed in speeds."""
+    bounds = BEAUFORT_BOUNDS
+    levels = BEAUFORT_LEVELS
+    return [levels[bisect_right(bounds, speed)] for speed in speeds]
+
+
+def wind_direction(degrees):
+    """Return the compass label of a wind direction in degrees."""
+    return WIND_DIRECTIONS[int((degrees + 11.25) % 360 // 22.5)]
+
+
+def wind_direction_series(directions):
+    """Return the compass label of every direction in directions."""
+    sectors = WIND_DIRECTIONS
+    return [sectors[int((degrees + 11.25) % 360 // 22.5)] for degrees in directions]
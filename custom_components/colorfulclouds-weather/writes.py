@@ -0,0 +1,35 @@
+"""Skip entity state writes that would not change anything."""
+import time
+
+from .const import DOMAIN, SUPPRESSED_WRITES
+
+
+class WriteFilter:
+    """Remember the fingerprint of the last state one entity wrote."""
+
+    def __init__(self, hass, heartbeat_minutes):
+        """Initialize, a heartbeat of 0 writes on every update."""
+        self._hass = hass
+        self._heartbeat = heartbeat_minutes * 60
+        self._fingerprint = None
+        self._written_at = 0.0
+
+    def should_write(self, fingerprint):
+        """Return True when fingerprint differs from the last write or the heartbeat is due."""
+        now = time.monotonic()
+        if (
+            self._heartbeat
+            and fingerprint == self._fingerprint
+            and now - self._written_at < self._heartbeat
+        ):
+            data = self._hass.data[DOMAIN]
+            data[SUPPRESSED_WRITES] = data.get(SUPPRESSED_WRITES, 0) + 1
+            return False
+        self._fingerprint = fingerprint
+        self._written_at = now
+        return True
+
+
+def suppressed_writes(hass):
+    """Return how many state writes the entities of this domain skipped."""
+    return hass.data[DOMAIN].get(SUPPRESSED_WRITES, 0)